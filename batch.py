@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# Пакетне обчислення покриття для списку передавачів.
+# Завдання групуються за мапою рельєфу: кожна мапа відкривається процесами пулу один раз,
+# а результати дописуються у файл JSON Lines щойно готові (перезапуск пропускає готові завдання).
+# Приклад:
+#   python batch.py jobs.csv results.jsonl --dem maps/srtm_42_03.asc --workers 8
+import os
+import sys
+import csv
+import json
+import logging
+import argparse
+import multiprocessing
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import maths # Допоміжний файл з математикою
+import engine # Обчислення покриття без інтерфейсу
+import dem # Читання мап та мозаїка плиток
+import cli # Завантаження мапи так само, як для одного передавача
+import coords # Перетворення координат масивами
+
+logger = logging.getLogger("batch")
+
+JOB_FIELDS = ("id", "dem", "lon", "lat", "template") # Інші стовпці CSV - перевизначення параметрів шаблону
+
+# Стан процесу пулу: мапа поточної групи завдань
+_batch_state = {}
+
+def read_jobs(file_path, default_dem=None):
+    """
+    Читання списку завдань із CSV чи JSON.
+
+    CSV: стовпці id, dem, lon, lat, template; непорожні значення інших стовпців
+    (назви параметрів шаблону) перевизначають параметри.
+    JSON: список об'єктів {"id", "dem", "lon", "lat", "template", "overrides": {назва: значення}}.
+
+    :param file_path: Файл завдань (.csv або .json).
+    :param default_dem: Мапа для завдань без поля dem.
+
+    :return: Список завдань {"id", "dem", "lon", "lat", "template", "overrides"};
+        id за змовчуванням - номер завдання у файлі.
+    """
+    if file_path.lower().endswith(".json"):
+        with open(file_path, "r", encoding="utf-8") as file:
+            records = json.load(file)
+    else:
+        with open(file_path, "r", encoding="utf-8-sig", newline="") as file:
+            records = []
+            for row in csv.DictReader(file):
+                overrides = {name: float(value) for name, value in row.items()
+                    if name not in JOB_FIELDS and value not in (None, "")}
+                records.append({**{name: row.get(name) for name in JOB_FIELDS}, "overrides": overrides})
+
+    jobs = []
+    for number, record in enumerate(records, 1):
+        dem_path = record.get("dem") or default_dem
+        if not dem_path:
+            raise ValueError(f"Завдання {number}: не вказано мапу (dem)")
+        jobs.append({
+            "id": str(record.get("id") or number),
+            "dem": dem_path,
+            "lon": float(record["lon"]),
+            "lat": float(record["lat"]),
+            "template": record["template"],
+            "overrides": {name: float(value) for name, value in (record.get("overrides") or {}).items()},
+        })
+    return jobs
+
+def completed_jobs(output_path):
+    """
+    Ідентифікатори завдань, що вже успішно записані у файл результатів.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue # Обірваний останній рядок перерваного запуску
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+def ray_statistics(coverage_rays, lon_start, lat_start):
+    """
+    Дальність покриття за азимутами та зведені показники.
+
+    :param coverage_rays: Словник {азимут: промінь у форматі maths_for_line або None}.
+    :param lon_start, lat_start: Розташування передавача.
+
+    :return: Словник з площею, дальністю (м) для кожного азимута та статистикою P_rec.
+    """
+    ranges = OrderedDict()
+    powers = []
+    covered_points = 0
+    for azimuth, ray in coverage_rays.items():
+        if not ray:
+            ranges[azimuth] = None # Немає даних рельєфу в цьому напрямку
+            continue
+        lons, lats, power, coverage = ray
+        covered = np.asarray(coverage, dtype=bool)
+        distances = maths.geodesic_distances(lon_start, lat_start, lons, lats, engine.GEODESIC)
+        ranges[azimuth] = float(distances[covered].max()) if covered.any() else 0.0
+        powers.append(np.asarray(power, dtype=float))
+        covered_points += int(covered.sum())
+
+    rays = [ray for ray in coverage_rays.values() if ray]
+    known = [value for value in ranges.values() if value is not None]
+    powers = np.concatenate(powers) if powers else np.zeros(0)
+    return {
+        "area_km2": engine.coverage_area(rays, lon_start, lat_start) if rays else 0.0,
+        "rays": len(rays),
+        "range_max_m": max(known, default=None),
+        "range_mean_m": float(np.mean(known)) if known else None,
+        "range_min_m": min(known, default=None),
+        "covered_fraction": covered_points / powers.size if powers.size else 0.0,
+        "power_max_dbw": float(powers.max()) if powers.size else None,
+        "power_mean_dbw": float(powers.mean()) if powers.size else None,
+        "ranges_m": {str(azimuth): value for azimuth, value in ranges.items()},
+    }
+
+def _init_batch(dem_path):
+    """
+    Ініціалізація процесу пулу: мапа групи відкривається один раз (з кешу .demcache - без розбору).
+    """
+    _batch_state["data"], _batch_state["header"] = cli.load_terrain(dem_path)
+
+def _run_job(job, settings):
+    """
+    Обчислення одного завдання в процесі пулу (віяло азимутів - одним calculate_coverage,
+    без кешу профілів: разове завдання їх більше не прочитає).
+
+    :return: Запис результату для файлу JSON Lines.
+    """
+    rays = engine.calculate_coverage(job["lon"], job["lat"], _batch_state["data"], _batch_state["header"],
+        settings, workers=1, use_cache=False, keep_empty=True)
+    coverage_rays = OrderedDict(zip(engine.coverage_azimuths(settings), rays))
+    return {"id": job["id"], "dem": job["dem"], "lon": job["lon"], "lat": job["lat"],
+        "template": job["template"], **ray_statistics(coverage_rays, job["lon"], job["lat"])}
+
+def job_settings(job, templates):
+    """
+    Параметри завдання: значення шаблону з перевизначеннями (шаблони розбираються один раз).
+    """
+    if job["template"] not in templates:
+        name, full_name, template = engine.parse_template_file(job["template"])
+        templates[job["template"]] = engine.template_values(template)
+    return {**templates[job["template"]], **job["overrides"]}
+
+def group_bounds(group, templates):
+    """
+    Рамка, що містить віяла променів усіх завдань групи (див. engine.fan_bounds).
+
+    :return: (x_min, x_max, y_min, y_max) або None, якщо жодне завдання не має коректних параметрів
+        (їх помилки запишуться під час запуску).
+    """
+    boxes = []
+    for job in group:
+        try:
+            settings = job_settings(job, templates)
+            boxes.append(engine.fan_bounds(job["lon"], job["lat"], engine.coverage_azimuths(settings),
+                settings["Радіус (m)"]))
+        except (OSError, ValueError, KeyError):
+            continue
+    if not boxes:
+        return None
+    x_mins, x_maxs, y_mins, y_maxs = zip(*boxes)
+    return min(x_mins), max(x_maxs), min(y_mins), max(y_maxs)
+
+def run_batch(jobs, output_path, workers=None):
+    """
+    Виконання завдань групами за мапою з потоковим записом результатів.
+
+    :param jobs: Завдання (див. read_jobs).
+    :param output_path: Файл JSON Lines; вже записані завдання пропускаються.
+    :param workers: Кількість процесів (None або 0 - усі ядра).
+
+    :return: Кількість виконаних завдань.
+    """
+    done = completed_jobs(output_path)
+    pending = [job for job in jobs if job["id"] not in done]
+    logger.info("Завдань: %d, уже виконано: %d", len(jobs), len(jobs) - len(pending))
+
+    # MGRS передавачів - одним перетворенням для всіх завдань
+    references = dict(zip((job["id"] for job in pending), coords.mgrs_references(
+        [job["lat"] for job in pending], [job["lon"] for job in pending])))
+
+    groups = OrderedDict()
+    for job in pending:
+        groups.setdefault(os.path.abspath(job["dem"]), []).append(job)
+
+    templates = {}
+    finished = 0
+    with open(output_path, "a", encoding="utf-8") as output:
+        for dem_path, group in groups.items():
+            try:
+                # Кеш мапи та плиток мозаїки, яких торкаються віяла завдань, створюється один раз
+                # до запуску пулу, щоб процеси не розбирали ту саму .asc одночасно
+                terrain, _ = cli.load_terrain(dem_path)
+                bounds = group_bounds(group, templates)
+                if isinstance(terrain, dem.Mosaic) and bounds is not None:
+                    terrain.cache_tiles(bounds)
+            except (OSError, ValueError) as e:
+                logger.error("Мапа %s: %s", dem_path, e)
+                for job in group:
+                    output.write(json.dumps({"id": job["id"], "error": str(e)}, ensure_ascii=False) + "\n")
+                output.flush()
+                continue
+            logger.info("Мапа %s: %d завдань", dem_path, len(group))
+
+            # Процеси запускаються так само, як пул engine.calculate_coverage (POOL_START_METHOD)
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_batch,
+                    initargs=(dem_path,), mp_context=multiprocessing.get_context(engine.POOL_START_METHOD)) as executor:
+                futures = {}
+                for job in group:
+                    try:
+                        futures[executor.submit(_run_job, job, job_settings(job, templates))] = job
+                    except (OSError, ValueError) as e:
+                        output.write(json.dumps({"id": job["id"], "error": str(e)}, ensure_ascii=False) + "\n")
+                output.flush()
+
+                for future in as_completed(futures):
+                    job = futures[future]
+                    try:
+                        record = future.result()
+                        record["mgrs"] = references[job["id"]]
+                        finished += 1
+                    except Exception as e:
+                        logger.error("Завдання %s: %s", job["id"], e)
+                        record = {"id": job["id"], "error": str(e)}
+                    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    output.flush() # Записане завдання не повторюється після перезапуску
+                    logger.info("Завдання %s готове (%d/%d)", job["id"], finished, len(pending))
+    return finished
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетне обчислення покриття для списку передавачів.")
+    parser.add_argument("jobs", help="файл завдань .csv або .json")
+    parser.add_argument("output", help="файл результатів JSON Lines (дописується, готові завдання пропускаються)")
+    parser.add_argument("--dem", help="мапа для завдань без стовпця dem")
+    parser.add_argument("-w", "--workers", type=int, default=0, help="кількість процесів (0 - усі ядра)")
+    parser.add_argument("--log-level", default="INFO", help="рівень журналу (DEBUG, INFO, WARNING, ERROR)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s %(name)s: %(message)s")
+
+    try:
+        jobs = read_jobs(args.jobs, default_dem=args.dem)
+    except (OSError, ValueError, KeyError) as e:
+        parser.exit(1, f"Помилка у файлі завдань: {e}\n")
+
+    run_batch(jobs, args.output, workers=args.workers)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
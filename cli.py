@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# Обчислення покриття з командного рядка, без інтерфейсу Qt.
+# Приклад:
+#   python cli.py maps/srtm_42_03.asc "templates/Новий РЕЗ.txt" 25.5 45.5 --output out/coverage --mode raster
+import os
+import sys
+import json
+import logging
+import argparse
+
+import engine # Обчислення покриття без інтерфейсу
+import dem # Читання мап та мозаїка плиток
+import viewshed # Покриття розгорткою кільцями
+import coords # Перетворення координат масивами
+
+logger = logging.getLogger("cli")
+
+MODES = ("rays", "raster", "viewshed")
+
+def load_terrain(dem_path):
+    """
+    Мапа рельєфу та поверхня для обчислень: якщо в теці мапи кілька плиток,
+    промені продовжуються сусідніми плитками (як в інтерфейсі); у перекриттях перевага за dem_path.
+
+    :return: (height_data, header) - мапа або dem.Mosaic та заголовок мапи.
+    """
+    data, header = dem.load_asc(dem_path)
+    terrain = dem.Mosaic.from_folder(os.path.dirname(os.path.abspath(dem_path)), primary=dem_path)
+    if len(terrain.tiles) > 1:
+        return terrain, header
+    return data, header
+
+def run(dem_path, template_path, lon, lat, output, mode="rays", workers=1, max_cells=None):
+    """
+    Обчислення покриття одного передавача та запис результатів.
+
+    Файли результатів:
+        - rays: <output>.json - промені та площа покриття;
+        - raster, viewshed: <output>.asc - растр P_rec та <output>.json - площа і параметри.
+
+    :param dem_path: Мапа рельєфу (.asc).
+    :param template_path: Шаблон параметрів у форматі templates/*.txt.
+    :param lon, lat: Розташування передавача.
+    :param output: Шлях результатів без розширення.
+    :param mode: "rays", "raster" або "viewshed" (див. COVERAGE_OUTPUT у main.py).
+    :param workers: Кількість процесів для променів (None або 0 - усі ядра).
+    :param max_cells: Максимальний розмір растра по стороні.
+
+    :return: Площа покриття (км²).
+    """
+    name, full_name, template = engine.parse_template_file(template_path)
+    settings = engine.template_values(template)
+    height_data, header = load_terrain(dem_path)
+    logger.info("Шаблон '%s', мапа %s, передавач %s, %s", full_name, dem_path, lon, lat)
+
+    summary = {
+        "dem": os.path.abspath(dem_path),
+        "template": name,
+        "lon": lon,
+        "lat": lat,
+        "mgrs": coords.mgrs_references([lat], [lon])[0],
+        "mode": mode,
+        "settings": settings,
+    }
+
+    if mode == "viewshed":
+        # Перешкоди об'єднаних комірок - з рівня "max" піраміди мапи
+        overviews = None if isinstance(height_data, dem.Mosaic) else dem.Pyramid(dem_path, height_data, header)
+        power, grid = viewshed.coverage_viewshed(lon, lat, height_data, header, settings, max_cells=max_cells,
+            overviews=overviews)
+    else:
+        rays = engine.calculate_coverage(lon, lat, height_data, header, settings, workers=workers)
+
+    if mode == "rays":
+        summary["area_km2"] = engine.coverage_area(rays, lon, lat) if rays else 0.0
+        summary["rays"] = [
+            {"lons": list(map(float, lons)), "lats": list(map(float, lats)),
+             "power": list(map(float, power)), "coverage": list(map(bool, coverage))}
+            for lons, lats, power, coverage in rays
+        ]
+    else:
+        if mode == "raster":
+            power, grid = engine.coverage_raster(rays, lon, lat, header, max_cells=max_cells)
+        summary["area_km2"] = engine.raster_coverage_area(power, grid, settings["Чутливість приймача (dbW)"])
+        dem.write_asc(output + ".asc", power, grid)
+
+    with open(output + ".json", "w", encoding="utf-8") as file:
+        json.dump(summary, file, ensure_ascii=False)
+
+    logger.info("Площа покриття: %s km²", summary["area_km2"])
+    return summary["area_km2"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Обчислення зони покриття передавача без інтерфейсу.")
+    parser.add_argument("dem", help="мапа рельєфу .asc")
+    parser.add_argument("template", help="шаблон параметрів (формат templates/*.txt)")
+    parser.add_argument("lon", type=float, help="довгота передавача")
+    parser.add_argument("lat", type=float, help="широта передавача")
+    parser.add_argument("-o", "--output", default="coverage", help="шлях результатів без розширення")
+    parser.add_argument("-m", "--mode", choices=MODES, default="rays", help="формат результату")
+    parser.add_argument("-w", "--workers", type=int, default=0, help="кількість процесів (0 - усі ядра)")
+    parser.add_argument("--max-cells", type=int, default=1000, help="максимальний розмір растра по стороні")
+    parser.add_argument("--profile-dump", help="файл для таблиць профілю кожного променя")
+    parser.add_argument("--geodesic", choices=("wgs84", "sphere"), default=engine.GEODESIC,
+        help="модель Землі для точок променів")
+    parser.add_argument("--interpolation", choices=dem.INTERPOLATION_METHODS, default=engine.INTERPOLATION,
+        help="вибірка висот рельєфу між центрами комірок")
+    parser.add_argument("--log-level", default="INFO", help="рівень журналу (DEBUG, INFO, WARNING, ERROR)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s %(name)s: %(message)s")
+    engine.PROFILE_DUMP = args.profile_dump
+    engine.GEODESIC = args.geodesic
+    engine.INTERPOLATION = args.interpolation
+
+    try:
+        area = run(args.dem, args.template, args.lon, args.lat, args.output, mode=args.mode,
+            workers=args.workers, max_cells=args.max_cells)
+    except KeyError as e:
+        parser.exit(2, f"У шаблоні бракує параметра {e}\n")
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"{e}\n")
+
+    print(area)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# Перетворення координат масивами: широта/довгота -> UTM -> MGRS.
+# Проєкція рахується pyproj для всіх точок однієї зони UTM за один виклик,
+# а рядки MGRS складаються з векторизованих індексів літер.
+import numpy as np
+from pyproj import Transformer
+
+BAND_LETTERS = "CDEFGHJKLMNPQRSTUVWX" # Широтні смуги по 8° від 80° пд. ш. (X - до 84° пн. ш.)
+COLUMN_LETTERS = ("ABCDEFGH", "JKLMNPQR", "STUVWXYZ") # Стовпці квадратів 100 км для зон 1, 2, 3 (mod 3)
+ROW_LETTERS = "ABCDEFGHJKLMNPQRSTUV" # Рядки квадратів 100 км (для парних зон зсув на 5)
+MGRS_ROUND_DECIMALS = 6 # Знаків після коми (м), до яких округлюються UTM перед відкиданням цифр MGRS
+
+# Перетворювачі WGS84 -> UTM за кодом EPSG зони (створюються один раз на зону)
+_transformers = {}
+
+def _transformer(epsg):
+    if epsg not in _transformers:
+        _transformers[epsg] = Transformer.from_crs("EPSG:4326", f"EPSG:{epsg}", always_xy=True)
+    return _transformers[epsg]
+
+def utm_zones(lats, lons):
+    """
+    Номери зон UTM з винятками для Норвегії та Шпіцбергена.
+
+    :param lats, lons: Масиви широт і довгот.
+
+    :return: Масив номерів зон (int).
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    lons = (lons + 180) % 360 - 180 # 180° - це -180°, зона 1
+    zones = (np.floor((lons + 180) / 6) + 1).astype(int)
+
+    # Південно-західна Норвегія: зона 32V розширена на захід
+    zones = np.where((lats >= 56) & (lats < 64) & (lons >= 3) & (lons < 12), 32, zones)
+
+    # Шпіцберген: зони 31X, 33X, 35X, 37X розширені, парні не використовуються
+    svalbard = (lats >= 72) & (lats < 84)
+    for zone, west, east in ((31, 0, 9), (33, 9, 21), (35, 21, 33), (37, 33, 42)):
+        zones = np.where(svalbard & (lons >= west) & (lons < east), zone, zones)
+    return zones
+
+def latlon_to_utm(lats, lons):
+    """
+    Конвертація масивів координат у UTM (як utm.from_latlon, але для багатьох точок).
+
+    :param lats, lons: Масиви широт і довгот однакової форми (від 80° пд. ш. до 84° пн. ш.).
+
+    :return: (eastings, northings, zone_numbers, zone_letters) - масиви тієї ж форми;
+        для південної півкулі northing містить фальшиве зміщення 10 000 000 м.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    if np.any((lats < -80) | (lats > 84)):
+        raise ValueError("Latitude out of UTM range (-80, 84)")
+
+    zones = utm_zones(lats, lons)
+    epsg = np.where(lats >= 0, 32600, 32700) + zones
+
+    eastings = np.empty(lats.shape)
+    northings = np.empty(lats.shape)
+    codes, inverse = np.unique(epsg, return_inverse=True)
+    inverse = inverse.reshape(lats.shape)
+    for index, code in enumerate(codes):
+        in_zone = inverse == index
+        eastings[in_zone], northings[in_zone] = _transformer(int(code)).transform(lons[in_zone], lats[in_zone])
+
+    letters = np.array(list(BAND_LETTERS))[_bands(lats)]
+    return eastings, northings, zones, letters
+
+def _bands(lats):
+    """
+    Індекси широтних смуг у BAND_LETTERS.
+    """
+    return np.clip(np.floor((np.asarray(lats, dtype=float) + 80) / 8).astype(int), 0, len(BAND_LETTERS) - 1)
+
+def latlon_to_mgrs(lats, lons, precision=5):
+    """
+    Конвертація масивів координат у рядки MGRS (як mgrs.MGRS().toMGRS, але для багатьох точок).
+
+    :param lats, lons: Масиви широт і довгот однакової форми (від 80° пд. ш. до 84° пн. ш.).
+    :param precision: Кількість цифр кожної координати: 5 - 1 м, 4 - 10 м, ..., 0 - лише квадрат 100 км.
+
+    :return: Масив рядків MGRS, наприклад "35TLL7477628631". Для точок, ближчих ніж ~1 мм до
+        лінії метрової сітки, остання цифра може відрізнятися на 1 від mgrs: проєкції pyproj і mgrs
+        розходяться на частки міліметра.
+    """
+    if not 0 <= precision <= 5:
+        raise ValueError("MGRS precision must be between 0 and 5")
+    eastings, northings, zones, letters = latlon_to_utm(lats, lons)
+    # Округлення до мікрометра: похибка рухомої коми (x.9999999) не зменшує цифру чи квадрат на 1
+    eastings = np.round(eastings, MGRS_ROUND_DECIMALS)
+    northings = np.round(northings, MGRS_ROUND_DECIMALS)
+
+    # Літери квадрата 100 км
+    columns = np.floor(eastings / 100000).astype(int) - 1
+    column_letters = _ascii(COLUMN_LETTERS)[(zones - 1) % 3, columns]
+    rows = (np.floor(northings / 100000).astype(int) + np.where(zones % 2 == 0, 5, 0)) % len(ROW_LETTERS)
+
+    # Цифри в межах квадрата (відкидаються, а не округлюються)
+    divisor = 10 ** (5 - precision)
+    easting_digits = np.floor(eastings % 100000).astype(int) // divisor
+    northing_digits = np.floor(northings % 100000).astype(int) // divisor
+
+    # Рядки складаються як матриця байтів ASCII фіксованої ширини
+    shape = zones.shape
+    chars = np.concatenate([
+        _digits(zones, 2),
+        _ascii(BAND_LETTERS)[_bands(lats)][..., None],
+        column_letters[..., None],
+        _ascii(ROW_LETTERS)[rows][..., None],
+        _digits(easting_digits, precision),
+        _digits(northing_digits, precision),
+    ], axis=-1)
+    width = chars.shape[-1]
+    return np.ascontiguousarray(chars).view(f"S{width}").reshape(shape).astype(f"U{width}")
+
+def mgrs_references(lats, lons, precision=5):
+    """
+    Те саме, що latlon_to_mgrs, але точки поза межами UTM (полярні райони) отримують None
+    замість помилки.
+
+    :return: Список рядків MGRS або None.
+    """
+    lats = np.atleast_1d(np.asarray(lats, dtype=float))
+    lons = np.atleast_1d(np.asarray(lons, dtype=float))
+    references = np.full(lats.shape, None, dtype=object)
+    valid = (lats >= -80) & (lats <= 84)
+    if valid.any():
+        references[valid] = latlon_to_mgrs(lats[valid], lons[valid], precision)
+    return references.tolist()
+
+def _ascii(letters):
+    """
+    Коди ASCII літер (рядка або кортежу рядків однакової довжини) як масив uint8.
+    """
+    if isinstance(letters, str):
+        return np.frombuffer(letters.encode("ascii"), dtype=np.uint8)
+    return np.array([_ascii(row) for row in letters])
+
+def _digits(values, count):
+    """
+    Десяткові цифри цілих чисел з провідними нулями: масив кодів ASCII форми values.shape + (count,).
+    """
+    powers = 10 ** np.arange(count - 1, -1, -1)
+    return ((np.asarray(values)[..., None] // powers) % 10 + ord("0")).astype(np.uint8)
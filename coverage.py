@@ -2,23 +2,13 @@ import numpy as np
 import math
 from maths import haversine_distance, fresnel_radius, get_height_for_coordinates
 from pprint import pprint
+import dem
 
 def load_asc(file_path):
     """
     Завантаження .asc файлу у numpy-масив.
     """
-    header = {}
-    with open(file_path, 'r') as file:
-        for _ in range(6):
-            line = file.readline()
-            key, value = line.split()
-            header[key] = float(value) if '.' in value else int(value)
-
-        data = np.loadtxt(file, dtype=float)
-
-    # Конвертуємо дані у Dask масив для ефективності
-    # data = da.from_array(data, chunks=(1000, 1000))
-    return data, header
+    return dem.load_asc(file_path)
 
 
 def calculate_coverage_area(tx_coords, terrain_data, header, tx_height, frequency, max_distance_km=300, step_azimuth=5, step_distance=1):
@@ -0,0 +1,803 @@
+#!/usr/bin/env python3
+# Читання мап рельєфу (.asc) та їх бінарний кеш поруч із вихідним файлом.
+import os
+import json
+import logging
+import warnings
+import tempfile
+import numpy as np
+from collections import OrderedDict
+
+CACHE_SUFFIX = ".demcache"  # Розширення бінарного кешу: maps/srtm_42_03.asc -> maps/srtm_42_03.asc.demcache
+CACHE_MAGIC = b"TOPODEM1"
+CACHE_ALIGN = 64            # Вирівнювання початку масиву у файлі кешу (байт)
+CHUNK_SIZE = 16 * 1024 * 1024  # Розмір блоку потокового читання .asc (байт)
+WHITESPACE = (b" ", b"\n", b"\r", b"\t")
+INTERPOLATION_METHODS = ("nearest", "bilinear", "bicubic") # Способи вибірки висот (див. sample_grid)
+
+logger = logging.getLogger("dem")
+
+# Ключі заголовка .asc (без урахування регістру) та їх назви в програмі
+HEADER_KEYS = {
+    "ncols": "ncols",
+    "nrows": "nrows",
+    "xllcorner": "xllcorner",
+    "yllcorner": "yllcorner",
+    "xllcenter": "xllcenter",
+    "yllcenter": "yllcenter",
+    "cellsize": "cellsize",
+    "nodata_value": "NODATA_value",
+}
+
+def read_asc_header(file):
+    """
+    Читання заголовка .asc з відкритого у двійковому режимі файлу.
+
+    Підтримуються необов'язковий NODATA_value та варіанти xllcenter/yllcenter
+    (переводяться у xllcorner/yllcorner, які використовує решта програми).
+    Після виклику позиція файлу - на початку даних.
+
+    :param file: Відкритий файл ('rb'), позиція на початку.
+
+    :return: Словник заголовка, наприклад {'ncols': 6000, 'nrows': 6000, 'xllcorner': 20.0, ...}.
+    """
+    header = {}
+    centers = {}
+    while True:
+        position = file.tell()
+        line = file.readline()
+        parts = line.split()
+        key = parts[0].decode("ascii", "replace").lower() if parts else ""
+        if len(parts) != 2 or key not in HEADER_KEYS:
+            file.seek(position)
+            break
+        text = parts[1].decode("ascii")
+        value = float(text) if any(c in text for c in ".eE") else int(text)
+        if key in ("xllcenter", "yllcenter"):
+            centers[key] = value
+        else:
+            header[HEADER_KEYS[key]] = value
+
+    missing = [key for key in ("ncols", "nrows", "cellsize") if key not in header]
+    if missing:
+        raise ValueError(f"Missing header keys: {', '.join(missing)}")
+
+    for key, value in centers.items():
+        header[key.replace("center", "corner")] = value - header['cellsize'] / 2
+    if "xllcorner" not in header or "yllcorner" not in header:
+        raise ValueError("Missing header keys: xllcorner/xllcenter or yllcorner/yllcenter")
+    return header
+
+def parse_asc(file_path, dtype=None, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Потоковий розбір .asc файлу у наперед виділений numpy-масив (без кешу).
+
+    Тіло файлу читається великими блоками байтів і розбирається numpy без
+    проміжних списків Python, тому пікове споживання пам'яті близьке до розміру
+    підсумкового масиву.
+
+    :param file_path: Адреса до файлу.
+    :param dtype: Тип масиву; None - int16 для цілих висот (SRTM), інакше float32.
+    :param chunk_size: Розмір блоку читання (байт).
+    :param progress: Функція progress(частка від 0 до 1), що викликається після кожного блоку.
+
+    :return: (data, header)
+    """
+    total_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as file:
+        header = read_asc_header(file)
+        shape = (header['nrows'], header['ncols'])
+        count = shape[0] * shape[1]
+
+        auto_dtype = dtype is None
+        data = np.empty(count, dtype=np.int16 if auto_dtype else dtype)
+        int_info = np.iinfo(np.int16)
+
+        filled = 0
+        tail = b""
+        while True:
+            block = file.read(chunk_size)
+            chunk = tail + block
+            if block:
+                # Останнє число блоку може бути неповним - переноситься в наступний
+                cut = max(chunk.rfind(separator) for separator in WHITESPACE) + 1
+                chunk, tail = chunk[:cut], chunk[cut:]
+            if chunk.strip():
+                values = _parse_numbers(chunk, file_path)
+                if filled + len(values) > count:
+                    raise ValueError(f"{file_path}: more values than nrows * ncols = {count}")
+
+                # Автоматичний тип: перехід на float32, щойно трапилось дробове чи завелике значення
+                if auto_dtype and data.dtype == np.int16 and len(values) and (
+                        values.min() < int_info.min or values.max() > int_info.max
+                        or (values.dtype.kind == 'f' and not np.array_equal(values, np.round(values)))):
+                    data = data.astype(np.float32)
+
+                data[filled:filled + len(values)] = values
+                filled += len(values)
+
+            if progress is not None:
+                progress(file.tell() / total_size if total_size else 1.0)
+            if not block:
+                break
+
+    if filled != count:
+        raise ValueError(f"{file_path}: expected {count} values, found {filled}")
+    return data.reshape(shape), header
+
+def _parse_numbers(chunk, file_path):
+    """
+    Розбір блоку чисел, розділених пробілами та переносами рядків.
+    """
+    # Цілі числа (типово для SRTM) розбираються в кілька разів швидше за дробові
+    is_integer = not any(marker in chunk for marker in (b".", b"e", b"E", b"n", b"N"))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            return np.fromstring(chunk, dtype=np.int64 if is_integer else np.float64, sep=' ')
+        except (ValueError, DeprecationWarning) as e:
+            raise ValueError(f"{file_path}: invalid grid data ({e})") from None
+
+def compact_dtype(data):
+    """
+    Найкомпактніший тип для збереження висот: int16 для цілих висот SRTM, інакше float32.
+    """
+    if data.dtype in (np.int16, np.float32):
+        return data.dtype
+    info = np.iinfo(np.int16)
+    if data.size and np.all(np.isfinite(data)) and data.min() >= info.min and data.max() <= info.max \
+            and np.array_equal(data, np.round(data)):
+        return np.dtype(np.int16)
+    return np.dtype(np.float32)
+
+def cache_path(file_path):
+    """
+    Шлях до бінарного кешу для .asc файлу.
+    """
+    return file_path + CACHE_SUFFIX
+
+def _source_signature(file_path):
+    stat = os.stat(file_path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+def read_cache_header(path):
+    """
+    Читання службової частини кешу.
+
+    :return: (meta, offset) - метадані (заголовок .asc, dtype, shape, підпис джерела)
+        та зсув початку масиву у файлі; (None, None), якщо файл не є кешем.
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            return None, None
+        meta_length = int.from_bytes(file.read(8), "little")
+        meta = json.loads(file.read(meta_length).decode("utf-8"))
+    offset = meta["offset"]
+    return meta, offset
+
+def write_cache(path, data, header, source_signature):
+    """
+    Запис кешу: магічні байти, довжина та JSON з метаданими, вирівняний сирий масив.
+    Запис іде в унікальний тимчасовий файл у тій самій теці, який потім атомарно замінює кеш,
+    тому кілька процесів, що одночасно створюють той самий кеш, не псують файли одне одного.
+    """
+    dtype = compact_dtype(data)
+    meta = {
+        "header": header,
+        "dtype": dtype.str,
+        "shape": list(data.shape),
+        "source": source_signature,
+        "offset": 0,
+    }
+    # Зсув залежить від довжини метаданих, тому рахується до стабілізації
+    while True:
+        meta_bytes = json.dumps(meta).encode("utf-8")
+        prefix = len(CACHE_MAGIC) + 8 + len(meta_bytes)
+        offset = -(-prefix // CACHE_ALIGN) * CACHE_ALIGN
+        if meta["offset"] == offset:
+            break
+        meta["offset"] = offset
+
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+        dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(CACHE_MAGIC)
+            file.write(len(meta_bytes).to_bytes(8, "little"))
+            file.write(meta_bytes)
+            file.write(b"\0" * (offset - prefix))
+            np.ascontiguousarray(data, dtype=dtype).tofile(file)
+        os.chmod(tmp_path, 0o644) # mkstemp створює файл лише для власника
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def open_cache(file_path):
+    """
+    Відкриття кешу через np.memmap, якщо він існує та відповідає вихідному файлу
+    (той самий розмір і час зміни).
+
+    :return: (data, header) або None, якщо кеш відсутній чи застарів.
+    """
+    return _open_cache_file(cache_path(file_path), _source_signature(file_path))
+
+def _open_cache_file(path, source_signature):
+    """
+    Відкриття файлу кешу через np.memmap, якщо він відповідає підпису джерела.
+
+    :return: (data, header) або None, якщо файл відсутній, пошкоджений, обрізаний чи застарів.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        meta, offset = read_cache_header(path)
+        if meta is None or meta["source"] != source_signature:
+            return None
+        dtype = np.dtype(meta["dtype"])
+        shape = tuple(meta["shape"])
+        # Недописаний чи обрізаний файл - промах кешу, а не SIGBUS під час читання memmap
+        if os.path.getsize(path) != offset + int(np.prod(shape)) * dtype.itemsize:
+            logger.warning("Кеш %s має неправильний розмір, його буде створено заново", path)
+            return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    data = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+    return data, meta["header"]
+
+def load_asc(file_path, use_cache=True, progress=None):
+    """
+    Завантаження .asc файлу у numpy-масив.
+
+    Під час першого відкриття файл розбирається та зберігається у бінарний кеш
+    (CACHE_SUFFIX), наступні відкриття лише відображають кеш у пам'ять (np.memmap),
+    тому в RAM потрапляють тільки сторінки, до яких є звернення.
+
+    :param file_path: Адреса до файлу (за змовчування всредині maps/).
+    :param use_cache: Чи використовувати та створювати бінарний кеш.
+    :param progress: Функція progress(частка від 0 до 1) для відображення розбору .asc.
+
+    :return data: Мапа рельєфу.
+    :return header: Інформація про заголовок файлу рельєфу.
+    """
+    if use_cache:
+        cached = open_cache(file_path)
+        if cached is not None:
+            return cached
+
+    source_signature = _source_signature(file_path)
+    data, header = parse_asc(file_path, progress=progress)
+
+    if use_cache:
+        try:
+            write_cache(cache_path(file_path), data, header, source_signature)
+            cached = open_cache(file_path)
+            if cached is not None:
+                return cached
+        except OSError as e:
+            # Тека лише для читання: працюємо з масивом у пам'яті
+            logger.warning("Не вдалося створити кеш для %s: %s", file_path, e)
+
+    return data, header
+
+def sample_grid(data, header, lons, lats, method="nearest"):
+    """
+    Висоти для масивів координат з однієї мапи.
+
+    :param data: Мапа рельєфу.
+    :param header: Інформація про заголовок файлу рельєфу.
+    :param lons, lats: Масиви довгот і широт однакової форми.
+    :param method: Інтерполяція (INTERPOLATION_METHODS): "nearest" - комірка, що містить точку,
+        "bilinear" - 2x2, "bicubic" - 4x4 сусідні центри комірок.
+
+    :return: (heights, valid) - висоти (float, NaN поза мапою та в комірках NODATA_value)
+        та маска точок з даними.
+    """
+    if method not in INTERPOLATION_METHODS:
+        raise ValueError(f"Unknown interpolation method: {method}")
+    inside, rows, cols = _grid_indices(header, lons, lats)
+    heights = np.full(inside.shape, np.nan)
+    if method == "nearest":
+        heights[inside] = data[rows[inside], cols[inside]]
+        nodata = header.get('NODATA_value')
+        if nodata is not None:
+            heights[heights == nodata] = np.nan
+    else:
+        heights[inside] = _interpolate(data, header, np.asarray(lons, dtype=float)[inside],
+            np.asarray(lats, dtype=float)[inside], method)
+    return heights, inside & ~np.isnan(heights)
+
+def _interpolate(data, header, lons, lats, method):
+    """
+    Білінійна або бікубічна (ядро Кіза, a = -0.5) інтерполяція між центрами комірок
+    для одновимірних масивів точок у межах мапи. Сусіди за краєм мапи замінюються крайніми
+    комірками; якщо хоч одна комірка ядра без даних - результат NaN.
+    """
+    cellsize = header['cellsize']
+    # Координати в одиницях комірок відносно центру комірки [0, 0]
+    u = (lons - header['xllcorner']) / cellsize - 0.5
+    v = (header['yllcorner'] + header['nrows'] * cellsize - lats) / cellsize - 0.5
+    col0, row0 = np.floor(u), np.floor(v)
+    tu, tv = u - col0, v - row0
+
+    if method == "bilinear":
+        offsets = np.arange(0, 2)
+        weights_u = np.stack([1 - tu, tu], axis=-1)
+        weights_v = np.stack([1 - tv, tv], axis=-1)
+    else:
+        offsets = np.arange(-1, 3)
+        weights_u, weights_v = _cubic_weights(tu), _cubic_weights(tv)
+
+    cols = np.clip(col0.astype(np.intp)[:, None] + offsets, 0, header['ncols'] - 1)
+    rows = np.clip(row0.astype(np.intp)[:, None] + offsets, 0, header['nrows'] - 1)
+    values = data[rows[:, :, None], cols[:, None, :]].astype(float)
+    nodata = header.get('NODATA_value')
+    if nodata is not None:
+        values[values == nodata] = np.nan
+    return np.einsum("nij,ni,nj->n", values, weights_v, weights_u)
+
+def _cubic_weights(t):
+    """
+    Ваги кубічної згортки Кіза (a = -0.5) для сусідів -1, 0, 1, 2 при зсуві t з [0, 1).
+    """
+    t2, t3 = t * t, t * t * t
+    return np.stack([
+        -0.5 * t3 + t2 - 0.5 * t,
+        1.5 * t3 - 2.5 * t2 + 1,
+        -1.5 * t3 + 2 * t2 + 0.5 * t,
+        0.5 * t3 - 0.5 * t2,
+    ], axis=-1)
+
+def cell_indices(header, lon, lat):
+    """
+    Комірка мапи, що містить точку.
+
+    :return: (inside, row, col) - чи точка в межах мапи та індекси комірки (0, якщо поза мапою).
+    """
+    return _grid_indices(header, lon, lat)
+
+def _grid_indices(header, lons, lats):
+    cellsize = header['cellsize']
+    ncols = header['ncols']
+    nrows = header['nrows']
+
+    # np.trunc повторює поведінку int() для від'ємних значень
+    cols = np.trunc((np.asarray(lons, dtype=float) - header['xllcorner']) / cellsize)
+    rows = np.trunc((header['yllcorner'] + nrows * cellsize - np.asarray(lats, dtype=float)) / cellsize)
+    inside = (cols >= 0) & (cols < ncols) & (rows >= 0) & (rows < nrows)
+    rows = np.where(inside, rows, 0).astype(np.intp)
+    cols = np.where(inside, cols, 0).astype(np.intp)
+    return inside, rows, cols
+
+def header_extent(header):
+    """
+    Межі мапи за заголовком: (x_min, x_max, y_min, y_max).
+    """
+    x_min = header['xllcorner']
+    y_min = header['yllcorner']
+    return (x_min, x_min + header['cellsize'] * header['ncols'],
+            y_min, y_min + header['cellsize'] * header['nrows'])
+
+def crop(data, header, bounds):
+    """
+    Фрагмент мапи, що покриває межі bounds (для np.memmap зріз не читає решту файлу).
+
+    :param data: Мапа рельєфу.
+    :param header: Інформація про заголовок файлу рельєфу.
+    :param bounds: (x_min, x_max, y_min, y_max) - межі у градусах; обрізаються межами мапи.
+
+    :return: (window, window_header) або None, якщо межі не перетинають мапу.
+    """
+    x_min, x_max, y_min, y_max = bounds
+    cellsize = header['cellsize']
+    top = header['yllcorner'] + header['nrows'] * cellsize
+
+    col0 = max(0, int(np.floor((x_min - header['xllcorner']) / cellsize)))
+    col1 = min(header['ncols'], int(np.ceil((x_max - header['xllcorner']) / cellsize)))
+    row0 = max(0, int(np.floor((top - y_max) / cellsize)))
+    row1 = min(header['nrows'], int(np.ceil((top - y_min) / cellsize)))
+    if col0 >= col1 or row0 >= row1:
+        return None
+
+    window_header = {**header, "ncols": col1 - col0, "nrows": row1 - row0,
+        "xllcorner": header['xllcorner'] + col0 * cellsize, "yllcorner": top - row1 * cellsize}
+    return data[row0:row1, col0:col1], window_header
+
+def read_header(file_path):
+    """
+    Читання лише заголовка .asc (без даних).
+    """
+    with open(file_path, 'rb') as file:
+        return read_asc_header(file)
+
+### Піраміда оглядових рівнів ###
+
+OVERVIEW_FACTORS = (2, 4, 8, 16, 32) # Коефіцієнти зменшення рівнів піраміди
+OVERVIEW_METHODS = ("max", "mean")   # Агрегація блоку комірок: найвища точка або середня висота
+OVERVIEW_STRIP = 256                 # Кількість рядків рівня, що обчислюються за раз
+
+def overview_path(file_path, factor, method):
+    """
+    Шлях до кешу оглядового рівня: maps/srtm_42_03.asc -> maps/srtm_42_03.asc.mean4.demcache
+    """
+    return f"{file_path}.{method}{factor}{CACHE_SUFFIX}"
+
+def overview_header(header, factor, shape):
+    """
+    Заголовок рівня: комірка у factor разів більша, верхній лівий кут збігається з мапою.
+
+    :param shape: Форма масиву рівня (рядки, стовпці).
+    """
+    top = header['yllcorner'] + header['nrows'] * header['cellsize']
+    cellsize = header['cellsize'] * factor
+    return {**header, "ncols": shape[1], "nrows": shape[0], "cellsize": cellsize,
+        "yllcorner": top - shape[0] * cellsize}
+
+def reduce_blocks(data, factor, method, nodata=None):
+    """
+    Зменшення мапи блоками factor x factor (неповні блоки на правому та нижньому краї теж враховуються).
+
+    :param data: Мапа рельєфу (обробляється смугами, тож np.memmap не читається в пам'ять цілком).
+    :param factor: Розмір блоку в комірках.
+    :param method: "max" або "mean" (див. OVERVIEW_METHODS).
+    :param nodata: Значення без даних; такі комірки не враховуються,
+        а блок лише з них отримує це значення.
+
+    :return: Масив float32 форми (ceil(nrows / factor), ceil(ncols / factor)).
+    """
+    if method not in OVERVIEW_METHODS:
+        raise ValueError(f"Unknown overview method: {method}")
+    rows, cols = data.shape
+    out_rows, out_cols = -(-rows // factor), -(-cols // factor)
+    reduce = np.nanmax if method == "max" else np.nanmean
+    result = np.empty((out_rows, out_cols), dtype=np.float32)
+
+    for start in range(0, out_rows, OVERVIEW_STRIP):
+        stop = min(start + OVERVIEW_STRIP, out_rows)
+        strip = np.full(((stop - start) * factor, out_cols * factor), np.nan, dtype=np.float32)
+        source = data[start * factor:stop * factor]
+        strip[:source.shape[0], :cols] = source
+        if nodata is not None:
+            strip[strip == nodata] = np.nan
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning) # блоки лише без даних
+            result[start:stop] = reduce(strip.reshape(stop - start, factor, out_cols, factor), axis=(1, 3))
+
+    if nodata is not None:
+        result[np.isnan(result)] = nodata
+    return result
+
+class Pyramid:
+    """
+    Оглядові рівні мапи (2x, 4x, 8x, ...) з агрегацією max або mean.
+
+    Кожен рівень будується з попереднього (вдвічі детальнішого) під час першого
+    звернення і зберігається поруч із мапою у форматі кешу (overview_path), тож
+    надалі лише відображається у пам'ять. Кеш рівня застаріває разом із .asc.
+    """
+    def __init__(self, file_path, data, header, use_cache=True):
+        """
+        :param file_path: Шлях до .asc мапи.
+        :param data, header: Мапа рельєфу та її заголовок (рівень 1).
+        :param use_cache: Чи зберігати рівні на диск.
+        """
+        self.file_path = file_path
+        self.data = data
+        self.header = header
+        self.use_cache = use_cache
+        self._levels = {} # (method, factor) -> (data, header)
+
+    def level(self, factor, method="mean"):
+        """
+        Рівень піраміди.
+
+        :param factor: 1 або значення з OVERVIEW_FACTORS.
+        :param method: "max" або "mean".
+
+        :return: (data, header) - масив висот рівня та його заголовок у форматі .asc.
+        """
+        if factor == 1:
+            return self.data, self.header
+        if factor not in OVERVIEW_FACTORS:
+            raise ValueError(f"Unsupported overview factor: {factor}")
+        key = (method, factor)
+        if key in self._levels:
+            return self._levels[key]
+
+        path = overview_path(self.file_path, factor, method)
+        signature = _source_signature(self.file_path) if self.use_cache else None
+        level = _open_cache_file(path, signature) if self.use_cache else None
+        if level is None:
+            finer, finer_header = self.level(factor // 2, method)
+            data = reduce_blocks(finer, 2, method, self.header.get("NODATA_value"))
+            data = data.astype(compact_dtype(data))
+            level = data, overview_header(self.header, factor, data.shape)
+            if self.use_cache:
+                try:
+                    write_cache(path, data, level[1], signature)
+                    level = _open_cache_file(path, signature) or level
+                except OSError as e:
+                    # Тека лише для читання: рівень лишається в пам'яті
+                    logger.warning("Не вдалося зберегти рівень піраміди %s: %s", path, e)
+            logger.debug("Рівень піраміди %s: %s", path, data.shape)
+
+        self._levels[key] = level
+        return level
+
+    def level_for(self, cells, method="mean"):
+        """
+        Найгрубший рівень, комірка якого не більша за cells комірок мапи.
+
+        :param cells: Бажаний розмір комірки в комірках мапи (наприклад, комірок на піксель екрана).
+
+        :return: (factor, data, header)
+        """
+        factor = max([1] + [f for f in OVERVIEW_FACTORS if f <= cells])
+        return (factor,) + tuple(self.level(factor, method))
+
+class MapCatalog:
+    """
+    Індекс мап теки, побудований лише з заголовків .asc (або метаданих кешу).
+
+    Для кожної мапи зберігаються межі, розмір комірки, розміри сітки, тип даних
+    (якщо мапу вже кешовано) та розмір файлу. Індекс записується у CATALOG_NAME
+    і при оновленні перечитує тільки нові чи змінені файли.
+    """
+    CATALOG_NAME = ".catalog.json"
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, self.CATALOG_NAME)
+        self.entries = {}
+        try:
+            with open(self.path, 'r', encoding="utf-8") as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def refresh(self):
+        """
+        Оновлення індексу: нові та змінені мапи перечитуються, видалені - прибираються.
+
+        :return: self (для ланцюжкових викликів).
+        """
+        changed = False
+        names = [name for name in os.listdir(self.folder) if name.endswith(".asc")]
+
+        for name in list(self.entries):
+            if name not in names:
+                del self.entries[name]
+                changed = True
+
+        for name in names:
+            file_path = os.path.join(self.folder, name)
+            try:
+                signature = _source_signature(file_path)
+                entry = self.entries.get(name)
+                # dtype стає відомим, коли з'являється кеш - тоді запис теж оновлюється
+                if entry is not None and entry["source"] == signature and \
+                        (entry["dtype"] is not None or not os.path.exists(cache_path(file_path))):
+                    continue
+                self.entries[name] = self._read_entry(file_path, signature)
+                changed = True
+            except (OSError, ValueError) as e:
+                logger.warning("Пропущено мапу %s: %s", file_path, e)
+                if self.entries.pop(name, None) is not None:
+                    changed = True
+
+        if changed:
+            self.save()
+        return self
+
+    def _read_entry(self, file_path, signature):
+        header, dtype = None, None
+        cache = cache_path(file_path)
+        if os.path.exists(cache):
+            try:
+                meta, _ = read_cache_header(cache)
+            except (OSError, ValueError, KeyError):
+                meta = None
+            if meta is not None and meta["source"] == signature:
+                header, dtype = meta["header"], meta["dtype"]
+        if header is None:
+            header = read_header(file_path)
+
+        return {
+            "header": header,
+            "extent": list(header_extent(header)),
+            "cellsize": header['cellsize'],
+            "shape": [header['nrows'], header['ncols']],
+            "dtype": dtype,
+            "size": signature["size"],
+            "source": signature,
+        }
+
+    def save(self):
+        """
+        Запис індексу через унікальний тимчасовий файл (як write_cache): процеси, що оновлюють
+        індекс одночасно, не перемішують JSON, а останній атомарно замінює файл.
+        """
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=self.CATALOG_NAME + ".", suffix=".tmp", dir=self.folder)
+            try:
+                with os.fdopen(fd, 'w', encoding="utf-8") as file:
+                    json.dump(self.entries, file, ensure_ascii=False, indent=1)
+                os.chmod(tmp_path, 0o644) # mkstemp створює файл лише для власника
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            # Тека лише для читання: індекс працює лише в пам'яті
+            logger.warning("Не вдалося зберегти індекс мап %s: %s", self.path, e)
+
+    def names(self):
+        """
+        Назви мап, відсортовані за алфавітом.
+        """
+        return sorted(self.entries)
+
+    def entry(self, name):
+        return self.entries[name]
+
+    def find(self, lon, lat):
+        """
+        Назви мап, що містять точку (lon, lat).
+        """
+        found = []
+        for name in self.names():
+            x_min, x_max, y_min, y_max = self.entries[name]["extent"]
+            if x_min <= lon < x_max and y_min < lat <= y_max:
+                found.append(name)
+        return found
+
+class Mosaic:
+    """
+    Набір мап-плиток (наприклад srtm_42_03 та srtm_43_03) як одна поверхня.
+
+    Плитки індексуються за межами із заголовків, а відкриваються (через кеш та
+    np.memmap) лише тоді, коли до них звертається профіль. Кількість відкритих
+    плиток обмежена max_tiles, найдавніше використана закривається першою.
+    """
+    MAX_RESIDENT_TILES = 9 # Передавач і сусідні плитки навколо
+
+    def __init__(self, tiles, max_tiles=MAX_RESIDENT_TILES):
+        """
+        :param tiles: Список пар (шлях до .asc, заголовок); там, де плитки перекриваються,
+            висоти беруться з першої за списком.
+        :param max_tiles: Скільки плиток одночасно тримати відкритими.
+        """
+        self.tiles = list(tiles)
+        self.extents = [header_extent(header) for _, header in self.tiles]
+        self.max_tiles = max_tiles
+        self._resident = OrderedDict() # індекс плитки -> масив висот
+
+        if self.extents:
+            x_mins, x_maxs, y_mins, y_maxs = zip(*self.extents)
+            self.extent = (min(x_mins), max(x_maxs), min(y_mins), max(y_maxs))
+        else:
+            self.extent = (0.0, 0.0, 0.0, 0.0)
+
+    @classmethod
+    def from_folder(cls, folder, max_tiles=MAX_RESIDENT_TILES, primary=None):
+        """
+        Мозаїка з усіх .asc у теці (межі беруться з індексу MapCatalog).
+
+        :param primary: Шлях до обраної мапи: у перекриттях вона має перевагу над сусідніми плитками
+            (інші впорядковані за назвою).
+        """
+        return cls.from_catalog(MapCatalog(folder).refresh(), max_tiles, primary)
+
+    @classmethod
+    def from_catalog(cls, catalog, max_tiles=MAX_RESIDENT_TILES, primary=None):
+        names = catalog.names()
+        if primary is not None and os.path.basename(primary) in names:
+            names.remove(os.path.basename(primary))
+            names.insert(0, os.path.basename(primary))
+        tiles = [(os.path.join(catalog.folder, name), catalog.entry(name)["header"]) for name in names]
+        return cls(tiles, max_tiles)
+
+    def __getstate__(self):
+        # Для передачі в процеси пулу: відкриті плитки не серіалізуються
+        state = self.__dict__.copy()
+        state["_resident"] = OrderedDict()
+        return state
+
+    def cache_tiles(self, bounds):
+        """
+        Створення кешу (CACHE_SUFFIX) плиток, що перетинають рамку, в поточному процесі.
+        Викликається перед запуском пулу, щоб процеси лише відображали готові кеші,
+        а не розбирали ту саму .asc одночасно; решта плиток, як і раніше, відкриваються лише за потреби.
+
+        :param bounds: (x_min, x_max, y_min, y_max) у градусах - рамка віяла променів (engine.fan_bounds).
+            Рамка ширша за самі промені, тому плитки, які не вдалося прочитати, пропускаються:
+            помилка виникне лише тоді, коли до плитки звернеться промінь.
+        """
+        # Запас на комірку: ядро інтерполяції та округлення на межі плитки
+        margin = max(header['cellsize'] for _, header in self.tiles) if self.tiles else 0
+        x_lo, x_hi, y_lo, y_hi = bounds[0] - margin, bounds[1] + margin, bounds[2] - margin, bounds[3] + margin
+        for index, (x_min, x_max, y_min, y_max) in enumerate(self.extents):
+            if x_max < x_lo or x_min > x_hi or y_max < y_lo or y_min > y_hi:
+                continue
+            try:
+                load_asc(self.tiles[index][0])
+            except (OSError, ValueError) as e:
+                logger.warning("Не вдалося підготувати плитку %s: %s", self.tiles[index][0], e)
+
+    def tile_data(self, index):
+        """
+        Масив висот плитки (відкривається за потреби, з оновленням черги LRU).
+        """
+        if index in self._resident:
+            self._resident.move_to_end(index)
+            return self._resident[index]
+
+        data, _ = load_asc(self.tiles[index][0])
+        self._resident[index] = data
+        while len(self._resident) > self.max_tiles:
+            self._resident.popitem(last=False)
+        return data
+
+    def sample(self, lons, lats, method="nearest"):
+        """
+        Висоти для масивів координат з усіх плиток (інтерполяція - в межах плитки, див. sample_grid).
+
+        :return: (heights, valid) - висоти (NaN там, де немає жодної плитки чи даних) та маска точок з даними.
+        """
+        lons = np.asarray(lons, dtype=float)
+        lats = np.asarray(lats, dtype=float)
+        heights = np.full(lons.shape, np.nan)
+        filled = np.zeros(lons.shape, dtype=bool)
+        if lons.size == 0:
+            return heights, filled
+
+        lon_min, lon_max = lons.min(), lons.max()
+        lat_min, lat_max = lats.min(), lats.max()
+        for index, (x_min, x_max, y_min, y_max) in enumerate(self.extents):
+            # Плитки поза рамкою запиту навіть не розглядаються
+            if x_max < lon_min or x_min > lon_max or y_max < lat_min or y_min > lat_max:
+                continue
+
+            inside, _, _ = _grid_indices(self.tiles[index][1], lons, lats)
+            inside &= ~filled
+            if not inside.any():
+                continue
+
+            tile_heights, _ = sample_grid(self.tile_data(index), self.tiles[index][1],
+                lons[inside], lats[inside], method)
+            heights[inside] = tile_heights
+            filled |= inside
+            if filled.all():
+                break
+        return heights, filled & ~np.isnan(heights)
+
+    def height(self, lon, lat):
+        """
+        Висота в одній точці або None, якщо точка не покрита жодною плиткою.
+        """
+        heights, inside = self.sample([lon], [lat])
+        return float(heights[0]) if inside[0] else None
+
+def write_asc(file_path, data, header):
+    """
+    Запис масиву у формат ESRI ASCII (.asc); NaN записуються як NODATA_value.
+
+    :param file_path: Куди записати файл.
+    :param data: Масив форми (nrows, ncols), перший рядок - північ.
+    :param header: Заголовок (ncols, nrows, xllcorner, yllcorner, cellsize, NODATA_value).
+    """
+    nodata = header.get('NODATA_value', -9999)
+    with open(file_path, 'w') as file:
+        file.write(f"ncols {int(header['ncols'])}\n")
+        file.write(f"nrows {int(header['nrows'])}\n")
+        for key in ("xllcorner", "yllcorner", "cellsize"):
+            file.write(f"{key} {float(header[key])!r}\n")
+        file.write(f"NODATA_value {nodata}\n")
+        np.savetxt(file, np.where(np.isnan(data), nodata, data), fmt="%.2f")
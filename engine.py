@@ -0,0 +1,1001 @@
+#!/usr/bin/env python3
+# Обчислення покриття без прив'язки до інтерфейсу Qt.
+# Усі функції приймають налаштування вкладки у форматі DEFAULT_TAB_SETTINGS ({назва: значення}).
+import os
+import io
+import math
+import itertools
+import logging
+import threading
+import multiprocessing
+import numpy as np
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from collections import OrderedDict, namedtuple
+from pyproj import Geod
+from shapely.geometry import Polygon
+from shapely.ops import orient
+
+import maths # Допоміжний файл з математикою
+import dem # Читання мап та мозаїка плиток
+
+logger = logging.getLogger("engine")
+
+PROFILE_DUMP = None # Файл, у який дописуються таблиці профілю кожного променя (None - вимкнено)
+GEODESIC = "wgs84" # Модель Землі для точок променів: "wgs84" - еліпсоїд, "sphere" - сфера (див. maths.geodesic_points)
+INTERPOLATION = "bilinear" # Вибірка висот рельєфу: "nearest", "bilinear" або "bicubic" (див. dem.sample_grid)
+PROFILE_COLUMNS = ("Точка", "Відстань (м)", "Висота рельєфу (м)", "Висота LOS (м)",
+    "Радіус Френеля (м)", "Втрати (м)", "Втрати (дБ)")
+
+def map_extent(header, shape, downsample_factor=1):
+    """
+    Межі мапи у градусах.
+
+    :param header: Інформація про заголовок файлу рельєфу.
+    :param shape: Форма масиву висот (рядки, стовпці).
+    :param downsample_factor: Коефіцієнт дискретизації, з яким отримано shape.
+
+    :return: (x_min, x_max, y_min, y_max)
+    """
+    cellsize_adjusted = header['cellsize'] * downsample_factor
+    x_min = header['xllcorner']
+    x_max = header['xllcorner'] + cellsize_adjusted * shape[1]
+    y_min = header['yllcorner']
+    y_max = header['yllcorner'] + cellsize_adjusted * shape[0]
+    return x_min, x_max, y_min, y_max
+
+def coverage_azimuths(settings):
+    """
+    Список азимутів сегмента за параметрами "Азимут (°)", "Кут (°)" та "Крок (°)".
+    """
+    step_azimuth = int(settings["Крок (°)"])            # Крок обчислень в межах сегмента (у градусах)
+    range_start = int(settings["Азимут (°)"])           # Початковий азимут сегмента (у градусах)
+    range_end = range_start + int(settings["Кут (°)"])  # Автоматично визначений крайній кут сегмента
+    return list(range(range_start, range_end, step_azimuth))
+
+def coordinates_away_from_centre_with_radius_and_azimuth(lat, lon, radius, azimuth, radians=False):
+    """
+    Пошук координат на певній відстані та під певним кутом від точки з заданими широтою та довготою.
+
+    :param lat, lon: Координати початку обчислень.
+    :param radius: Обрана відстань від точки початку.
+    :param azimuth: Кутове значення відхилення в градусах або радіанах.
+    :param radians (bool): Якщо True, azimuth інтерпретується в радіанах. Інакше - в градусах.
+
+    :return: Пара (широта, довгота), що представляє обчислені координати (модель Землі - GEODESIC).
+    """
+    if radians:
+        azimuth = math.degrees(azimuth)  # maths.geodesic_points приймає градуси
+
+    lons, lats = maths.geodesic_points(lon, lat, [azimuth], [radius], GEODESIC)
+    point = [float(lats[0, 0]), float(lons[0, 0])]
+
+    return point
+
+def adjust_to_map_boundary(lat_start, lon_start, lon_end, lat_end, extent):
+    """
+    Коригування точки кінцевого маршруту на межі карти.
+
+    :param extent: Межі карти (x_min, x_max, y_min, y_max), див. map_extent.
+
+    :return: (lon, lat) - остання точка відрізка в межах карти
+        або стартова точка, якщо відрізок не перетинає карту.
+    """
+    _, lons, lats = maths.clip_segments(lon_start, lat_start, [lon_end], [lat_end], extent)
+    return float(lons[0]), float(lats[0])
+
+def ray_lengths(lon_start, lat_start, azimuths, radius, extent):
+    """
+    Довжини променів усіх азимутів, обрізаних межами мапи, одним векторизованим викликом.
+
+    Кінці променів (GEODESIC) обрізаються прямокутником extent у градусах (maths.clip_segments),
+    довжина обрізаного променя - геодезична відстань до точки виходу.
+
+    :param lon_start, lat_start: Розташування передавача.
+    :param azimuths: Азимути променів (у градусах).
+    :param radius: "Радіус (m)".
+    :param extent: Межі (x_min, x_max, y_min, y_max), див. terrain_extent.
+
+    :return: Масив довжин (м); 0 - промінь не перетинає мапу.
+    """
+    lons, lats = maths.geodesic_points(lon_start, lat_start, azimuths, [radius], GEODESIC)
+    t, lons_end, lats_end = maths.clip_segments(lon_start, lat_start, lons[:, 0], lats[:, 0], extent)
+    return np.where(t >= 1, float(radius),
+        maths.geodesic_distances(lon_start, lat_start, lons_end, lats_end, GEODESIC))
+
+def fan_bounds(lon_start, lat_start, azimuths, radius, points=8):
+    """
+    Рамка, що містить усі промені віяла (за кількома точками вздовж кожної геодезичної лінії).
+
+    :param points: Кількість точок на промінь, включно з передавачем і кінцем.
+
+    :return: (x_min, x_max, y_min, y_max) у градусах.
+    """
+    lons, lats = maths.geodesic_points(lon_start, lat_start, azimuths, np.linspace(0, radius, points), GEODESIC)
+    return lons.min(), lons.max(), lats.min(), lats.max()
+
+def link_budget(settings):
+    """
+    Енергетика лінії без втрат на трасі: потужність передавача (дБВт), підсилення антен
+    та втрати в трактах.
+    """
+    P_trm = settings["Потужність передавача (W)"]                       # Потужність передавача (Вт)
+    G_trm = settings["Коеф. підсилення антени (dBi)"]              # Посилення антени передавача (дБi)
+    L_dp = settings["Втрати в дуплексному фільтрі"]                     # Втрати в дуплексному фільтри
+    L_f_trm = settings["Втрати в фідері передавального тракту (dB)"]    # Втрати в фідері передавального тракту (дБ)
+    L_dop_trm = settings["Додаткові втрати в передавальному тракті"]    # Додаткові втрати в передавальному тракті (дБ)
+    G_rec = settings["Коеф. підсилення приймальної антени (dBi)"]  # Коефіцієнт підсилення приймальної антени (дБi)
+    L_f_rec = settings["Втрати в фідері приймального тракту (dB)"]      # Втрати фідера приймача (дБ)
+    L_dop_rec = settings["Додаткові втрати в приймальному тракті"]      # Втрати через доплер приймача (дБ)
+
+    return (10 * np.log10(P_trm) + G_trm + G_rec - L_dp - L_f_trm - L_dop_trm -
+              L_f_rec - L_dop_rec)
+
+def terrain_extent(height_data, header):
+    """
+    Межі рельєфу: однієї мапи або всієї мозаїки (dem.Mosaic).
+    """
+    if isinstance(height_data, dem.Mosaic):
+        return height_data.extent
+    return map_extent(header, height_data.shape)
+
+def sample_heights(lons, lats, height_data, header, method=None):
+    """
+    Висоти для масивів координат з однієї мапи або мозаїки (dem.Mosaic).
+
+    :param method: Інтерполяція (dem.INTERPOLATION_METHODS); None - INTERPOLATION.
+
+    :return: (heights, valid) - висоти (NaN без даних) та маска точок з даними.
+    """
+    method = method or INTERPOLATION
+    if isinstance(height_data, dem.Mosaic):
+        return height_data.sample(lons, lats, method)
+    return maths.get_heights_for_coordinates(lons, lats, height_data, header, method)
+
+def sample_route(lon_start, lat_start, azimuth, d_total, points_step, height_data, header):
+    """
+    Рівномірні точки маршруту вздовж геодезичної лінії (GEODESIC) від передавача та висоти в них.
+
+    Якщо маршрут виходить за межі наявних даних (край мапи або прогалина між
+    плитками мозаїки), кінець переноситься на останню точку з даними.
+
+    :param azimuth: Азимут маршруту від передавача (у градусах).
+    :param d_total: Довжина маршруту (м).
+
+    :return: (d_total, distances, lons, lats, heights) або None, якщо точок замало для профілю.
+    """
+    while True:
+        # Кількість точок уздовж маршруту (дистанція буде автоматично змінюватися залежно від довжини маршруту)
+        num_points = int(d_total/points_step)
+        if num_points < 4: # Мінімум точок профілю
+            return None
+
+        # Генерація точок за маршрутом
+        distances = np.linspace(0, d_total, num_points)
+        lons, lats = maths.geodesic_points(lon_start, lat_start, [azimuth], distances, GEODESIC)
+        lons, lats = lons[0], lats[0]
+
+        heights, inside = sample_heights(lons, lats, height_data, header)
+        if inside.all():
+            return d_total, distances, lons, lats, heights
+
+        first_gap = int(np.argmin(inside))
+        if first_gap == 0:
+            return None
+        d_total = distances[first_gap - 1]
+
+def sample_routes(lon_start, lat_start, azimuths, lengths, points_step, height_data, header):
+    """
+    Маршрути sample_route для всього віяла азимутів: точки всіх променів (різної довжини)
+    складаються в один масив, тож геодезичні лінії рахуються одним викликом, а висоти -
+    одним зверненням до мапи. Лише промені, що впираються в прогалину даних,
+    довибираються вкороченими через sample_route.
+
+    :param azimuths: Азимути маршрутів (у градусах).
+    :param lengths: Довжини маршрутів (м), див. ray_lengths.
+
+    :return: Список маршрутів (див. sample_route) або None у порядку азимутів.
+    """
+    routes = [None] * len(azimuths)
+    # Кількість точок уздовж маршруту, як у sample_route
+    counts = [int(d_total/points_step) for d_total in lengths]
+    rays = [index for index, count in enumerate(counts) if count >= 4]
+    if not rays:
+        return routes
+
+    distances = [np.linspace(0, lengths[index], counts[index]) for index in rays]
+    ray_azimuths = np.repeat(np.asarray(azimuths, dtype=float)[rays], [counts[index] for index in rays])
+    lons, lats = maths.geodesic_fwd(lon_start, lat_start, ray_azimuths, np.concatenate(distances), GEODESIC)
+    heights, inside = sample_heights(lons, lats, height_data, header)
+
+    bounds = np.cumsum([0] + [counts[index] for index in rays])
+    for number, index in enumerate(rays):
+        ray = slice(bounds[number], bounds[number + 1])
+        if inside[ray].all():
+            routes[index] = lengths[index], distances[number], lons[ray], lats[ray], heights[ray]
+            continue
+        first_gap = int(np.argmin(inside[ray]))
+        if first_gap > 0:
+            routes[index] = sample_route(lon_start, lat_start, azimuths[index], distances[number][first_gap - 1],
+                points_step, height_data, header)
+    return routes
+
+### Кеш профілів рельєфу ###
+
+# Профіль рельєфу одного азимута: усе, що не залежить від параметрів радіоканалу
+TerrainProfile = namedtuple("TerrainProfile", ("d_total", "distances", "lons", "lats", "terrain_heights"))
+
+class ProfileCache:
+    """
+    LRU-кеш профілів рельєфу та результатів етапів розрахунку променя,
+    обмежений сумарним розміром масивів (байт).
+    Значення None (в напрямку азимута немає даних) теж кешується.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict() # ключ -> (профіль, розмір)
+
+    @staticmethod
+    def value_nbytes(value):
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        if isinstance(value, tuple):
+            return sum(ProfileCache.value_nbytes(item) for item in value)
+        return 0
+
+    def get(self, key):
+        """
+        :return: (True, профіль) або (False, None), якщо профілю немає в кеші.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[0]
+
+    def put(self, key, profile):
+        size = self.value_nbytes(profile)
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (profile, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+PROFILE_CACHE_SIZE = 256 * 1024 * 1024 # Максимальний розмір кешу профілів (байт)
+profile_cache = ProfileCache(PROFILE_CACHE_SIZE)
+
+# Етапи розрахунку променя: параметри вкладки, від яких залежить етап, та попередні етапи.
+# Результат етапу кешується з ключем (профіль, етап, значення всіх його параметрів),
+# тож зміна параметра перераховує лише етапи, що від нього залежать
+# ("coverage" - лише порівняння з порогом, його результат не кешується).
+LINE_STAGES = OrderedDict([
+    ("profile", (("Радіус (m)", "Динамічний крок"), ())),
+    ("diffraction", (("Висота передавача (m)", "Висота приймача (m)", "Частота (GHz)"), ("profile",))),
+    ("path_loss", (("Частота (GHz)", "Ймовірність (%)"), ("profile",))),
+    ("power", ((
+        "Потужність передавача (W)", "Коеф. підсилення антени (dBi)", "Втрати в дуплексному фільтрі",
+        "Втрати в фідері передавального тракту (dB)", "Додаткові втрати в передавальному тракті",
+        "Коеф. підсилення приймальної антени (dBi)", "Втрати в фідері приймального тракту (dB)",
+        "Додаткові втрати в приймальному тракті",
+    ), ("diffraction", "path_loss"))),
+    ("coverage", (("Чутливість приймача (dbW)",), ("power",))),
+])
+
+def stage_settings(stage):
+    """
+    Усі параметри вкладки, від яких залежить етап (разом із попередніми етапами).
+    """
+    names, upstream = LINE_STAGES[stage]
+    keys = list(names)
+    for previous in upstream:
+        keys += [name for name in stage_settings(previous) if name not in keys]
+    return tuple(keys)
+
+def stage_key(key, stage, settings):
+    """
+    Ключ кешу етапу: (ключ профілю, етап, значення всіх параметрів етапу); None - без кешу.
+    """
+    if key is None:
+        return None
+    return key, stage, tuple(settings[name] for name in stage_settings(stage))
+
+def cached_stage(key, stage, settings, compute):
+    """
+    Результат етапу stage з кешу profile_cache або compute(), якщо його параметри змінились.
+
+    :param key: Ключ профілю (profile_key); None - без кешу.
+    """
+    key = stage_key(key, stage, settings)
+    if key is None:
+        return compute()
+    found, value = profile_cache.get(key)
+    if not found:
+        value = compute()
+        profile_cache.put(key, value)
+    return value
+
+def terrain_source_key(height_data, header):
+    """
+    Ідентифікатор мапи рельєфу для ключа кешу профілів.
+
+    :return: Кортеж (файл кешу .demcache з часом зміни або шляхи плиток мозаїки, заголовок)
+        або None для масиву в пам'яті (такі профілі не кешуються).
+    """
+    if isinstance(height_data, dem.Mosaic):
+        source = ("mosaic",) + tuple(path for path, _ in height_data.tiles)
+    elif isinstance(height_data, np.memmap) and height_data.filename:
+        try:
+            mtime = os.stat(height_data.filename).st_mtime_ns # кеш мапи міг бути перезаписаний
+        except OSError:
+            return None
+        source = ("memmap", height_data.filename, height_data.offset, mtime)
+    else:
+        return None
+    return source, tuple(sorted(header.items()))
+
+def profile_key(source, lon_start, lat_start, azimuth, radius, points_step, clip_extent):
+    """
+    Ключ кешу профілю: (мапа, передавач, азимут, радіус, "Динамічний крок", межі обрізки,
+    GEODESIC, INTERPOLATION).
+
+    :param source: Результат terrain_source_key; None - профіль не кешується (повертається None).
+    """
+    if source is None:
+        return None
+    return source, lon_start, lat_start, azimuth, radius, points_step, clip_extent, GEODESIC, INTERPOLATION
+
+def terrain_profile(lon_start, lat_start, height_data, header, azimuth, radius, points_step, clip_extent=None,
+        length=None):
+    """
+    Профіль рельєфу для одного азимута: точки маршруту та висоти.
+
+    :param lon_start, lat_start: Розташування передавача.
+    :param height_data: Мапа рельєфу або мозаїка плиток (dem.Mosaic).
+    :param header: Інформація про заголовок файлу рельєфу.
+    :param azimuth: Азимут променя (у градусах).
+    :param radius: "Радіус (m)".
+    :param points_step: "Динамічний крок".
+    :param clip_extent: Межі, до яких обрізається промінь (за змовчуванням - межі height_data).
+    :param length: Довжина променя, обрізаного межами (ray_lengths); None - обчислюється тут.
+
+    :return: TerrainProfile або None, якщо в напрямку азимута немає даних рельєфу.
+    """
+    return terrain_profiles(lon_start, lat_start, height_data, header, [azimuth], radius, points_step,
+        clip_extent, None if length is None else [length])[0]
+
+def terrain_profiles(lon_start, lat_start, height_data, header, azimuths, radius, points_step, clip_extent=None,
+        lengths=None):
+    """
+    Профілі рельєфу для віяла азимутів однією вибіркою з мапи (sample_routes).
+
+    :param lengths: Довжини променів, обрізаних межами (ray_lengths); None - обчислюються тут.
+
+    :return: Список TerrainProfile або None у порядку азимутів (див. terrain_profile).
+    """
+    # Довжина променів у межах карти
+    if lengths is None:
+        if clip_extent is None:
+            clip_extent = terrain_extent(height_data, header)
+        lengths = ray_lengths(lon_start, lat_start, azimuths, radius, clip_extent)
+    for azimuth, length in zip(azimuths, lengths):
+        if length < radius:
+            logger.debug("Змінено! Азимут %s обрізано межею мапи: %s м", azimuth, length)
+
+    # Точки маршрутів та висоти рельєфу (промінь обрізається там, де закінчуються дані)
+    routes = sample_routes(lon_start, lat_start, azimuths, lengths, points_step, height_data, header)
+    # Висоти вже гладкі: інтерполяція сітки (INTERPOLATION) замість сплайна вздовж променя
+    return [None if route is None else TerrainProfile(*route) for route in routes]
+
+def maths_for_line(lon_start, lat_start, height_data, header, azimuth, settings, clip_extent=None, length=None):
+    """
+    Математика втрат на відрізку для одного азимута.
+
+    Етапи (див. LINE_STAGES) кешуються для мап із файлу кешу чи мозаїки: після зміни
+    параметра перераховуються лише залежні від нього етапи.
+
+    :param lon_start, lat_start: Розташування передавача.
+    :param height_data: Мапа рельєфу або мозаїка плиток (dem.Mosaic).
+    :param header: Інформація про заголовок файлу рельєфу.
+    :param azimuth: Азимут променя (у градусах).
+    :param settings: Параметри вкладки {назва: значення}.
+    :param clip_extent: Межі, до яких обрізається промінь (за змовчуванням - межі height_data).
+    :param length: Довжина обрізаного променя, якщо вже відома (див. ray_lengths).
+
+    :return: Промінь [lons, lats, P_rec_real_points, coverage_map_points]
+        або None, якщо в напрямку азимута немає даних рельєфу.
+    """
+    radius, points_step = settings["Радіус (m)"], settings["Динамічний крок"]
+    key = profile_key(terrain_source_key(height_data, header), lon_start, lat_start, azimuth, radius,
+        points_step, clip_extent)
+    profile = cached_stage(key, "profile", settings, lambda: terrain_profile(lon_start, lat_start,
+        height_data, header, azimuth, radius, points_step, clip_extent, length))
+    if profile is None:
+        return None
+    return line_from_profile(profile, azimuth, settings, key)
+
+def diffraction_losses(profile, settings):
+    """
+    Етап "diffraction": лінія LOS та втрати на перешкодах уздовж профілю.
+
+    :return: (los_heights, losses, cumulative_losses_db) - висоти LOS у точках профілю,
+        втрати в кожній точці та сумарні втрати до точки (дБ).
+    """
+    freq_mhz = settings["Частота (GHz)"]            # Частота в ГГц
+    lambda_wave = 3e8 / (freq_mhz * 1e6)            # Довжина хвилі в метрах
+    num_points = len(profile.distances)
+
+    # Висота антен над рельєфом
+    tx_height = settings["Висота передавача (m)"] + profile.terrain_heights[0]
+    rx_height = settings["Висота приймача (m)"] + profile.terrain_heights[-1]
+
+    # Обчислення лінії LOS з урахуванням висот антен (у 10 разів щільніше за профіль)
+    smooth_los_heights = maths.calculate_los_with_antenna(
+        np.empty(num_points * 10),
+        profile.terrain_heights[[0, -1]],
+        tx_height,
+        rx_height
+    )
+
+    # Втрати до точки i - префіксна сума втрат у точках профілю
+    losses = maths.integrated_losses_array(profile.distances, profile.terrain_heights,
+        smooth_los_heights, profile.d_total, lambda_wave)
+    return smooth_los_heights[:num_points], losses, maths.losses_linear_to_db(np.cumsum(losses))
+
+def path_losses(profile, settings):
+    """
+    Етап "path_loss": модель Лонглі-Райса для точок 1..n-1 профілю.
+    """
+    freq_mhz = settings["Частота (GHz)"]            # Частота в ГГц
+    lambda_wave = 3e8 / (freq_mhz * 1e6)            # Довжина хвилі в метрах
+    q_percent = settings["Ймовірність (%)"]         # Відсоток імовірності ціле число від 1 до 99
+    wa = 4000                                       # Роздільна здатність у метрах/Підібрано, щоб sigma_L = 5,5 дБ
+    return maths.longley_rice_array(freq_mhz, profile.distances[1:], q_percent, wa, lambda_wave)
+
+def line_from_profile(profile, azimuth, settings, key=None):
+    """
+    Рівень сигналу та покриття вздовж готового профілю рельєфу (лише параметри радіоканалу).
+
+    :param profile: TerrainProfile.
+    :param azimuth: Азимут променя (у градусах).
+    :param settings: Параметри вкладки {назва: значення}.
+    :param key: Ключ профілю для кешу етапів (None - без кешу).
+
+    :return: Промінь [lons, lats, P_rec_real_points, coverage_map_points].
+    """
+    P_rec = settings["Чутливість приймача (dbW)"]   # Порогове значення добиття (дБВт)
+    logger.debug("Азимут %s: висота рельєфу передавача %s", azimuth, profile.terrain_heights[0])
+
+    diffraction = cached_stage(key, "diffraction", settings, lambda: diffraction_losses(profile, settings))
+
+    # Рівень сигналу на кожній точці: енергетика мінус втрати на трасі та дифракції
+    P_rec_real_points = cached_stage(key, "power", settings, lambda: link_budget(settings) - (
+        cached_stage(key, "path_loss", settings, lambda: path_losses(profile, settings)) + diffraction[2][1:]))
+
+    # Таблиця профілю записується у файл лише на вимогу
+    if PROFILE_DUMP:
+        lambda_wave = 3e8 / (settings["Частота (GHz)"] * 1e6)
+        dump_profile(PROFILE_DUMP, azimuth, profile.distances, profile.terrain_heights,
+            diffraction[0], maths.fresnel_radius(profile.distances, profile.d_total, lambda_wave),
+            diffraction[1])
+
+    # Етап "coverage": перевірка покриття на кожній точці
+    coverage_map_points = (P_rec_real_points >= P_rec).tolist()
+
+    ray = [profile.lons[1::], profile.lats[1::], P_rec_real_points.tolist(), coverage_map_points]
+    return ray
+
+def dump_profile(file_path, azimuth, distances, terrain_heights, los_heights, fresnel_r, losses):
+    """
+    Дописування таблиці профілю одного променя у файл одним записом.
+
+    Таблиця форматується цілком (np.savetxt), тож промені з різних процесів пулу
+    не перемішуються рядками.
+
+    :param file_path: Файл таблиць профілю.
+    :param azimuth: Азимут променя (у градусах).
+    :param distances, terrain_heights, los_heights: Згладжений профіль траси.
+    :param fresnel_r, losses: Радіус Френеля та втрати (лінійні) в кожній точці.
+    """
+    table = np.column_stack((np.arange(1, len(distances) + 1), distances, terrain_heights, los_heights,
+        fresnel_r, losses, maths.losses_linear_to_db(losses)))
+    buffer = io.StringIO()
+    np.savetxt(buffer, table, fmt=["%-10d"] + ["%-20.2f"] * 6, delimiter="",
+        header=f"Азимут {azimuth}\n{PROFILE_COLUMNS[0]:<10}" + "".join(f"{column:<20}" for column in PROFILE_COLUMNS[1:]),
+        comments="# ")
+    with open(file_path, "ab", buffering=0) as file:
+        file.write((buffer.getvalue() + "\n").encode("utf-8"))
+
+# Стан процесу-обчислювача: мапа, підключена зі спільної пам'яті
+_worker_state = {}
+
+# Процеси пулу запускаються начисто ("spawn"): fork багатопотокового процесу Qt може зависнути
+POOL_START_METHOD = "spawn"
+
+# Пул, що живе між розрахунками (live preview запускає їх часто), та його параметри
+_pool = {"executor": None, "key": None}
+_pool_lock = threading.Lock()
+
+def _new_pool(workers, initargs):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD),
+        initializer=_init_worker, initargs=initargs)
+
+def coverage_pool(workers, initargs):
+    """
+    Спільний пул процесів calculate_coverage: створюється заново лише тоді, коли змінилися
+    мапа, кількість процесів чи глобальні параметри (initargs для _init_worker).
+    Завдання попереднього пулу, якщо ще виконуються, завершуються у своїх процесах.
+    """
+    key = (workers, initargs)
+    with _pool_lock:
+        if _pool["executor"] is not None and _pool["key"] != key:
+            _pool["executor"].shutdown(wait=False)
+            _pool["executor"] = None
+        if _pool["executor"] is None:
+            _pool["executor"] = _new_pool(workers, initargs)
+            _pool["key"] = key
+        return _pool["executor"]
+
+def shutdown_pool(wait=True):
+    """
+    Зупинка спільного пулу (наприклад, під час виходу з програми або після збою процесу пулу).
+    """
+    with _pool_lock:
+        executor, _pool["executor"], _pool["key"] = _pool["executor"], None, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+def _init_worker(source, shape, dtype, header, clip_extent, profile_dump=None, geodesic=GEODESIC,
+        interpolation=INTERPOLATION):
+    """
+    Ініціалізація процесу пулу: підключення до мапи рельєфу без копіювання та серіалізації масиву.
+
+    :param source: ("shm", назва спільної пам'яті), ("memmap", шлях до файлу, зсув)
+        або ("mosaic", dem.Mosaic).
+    :param profile_dump, geodesic, interpolation: Значення PROFILE_DUMP, GEODESIC та INTERPOLATION
+        головного процесу.
+    """
+    global PROFILE_DUMP, GEODESIC, INTERPOLATION
+    PROFILE_DUMP = profile_dump
+    GEODESIC = geodesic
+    INTERPOLATION = interpolation
+    if source[0] == "mosaic":
+        _worker_state["data"] = source[1] # плитки відкриваються в процесі за потреби
+    elif source[0] == "memmap":
+        _worker_state["data"] = np.memmap(source[1], dtype=dtype, mode='r', offset=source[2], shape=shape)
+    else:
+        shm = shared_memory.SharedMemory(name=source[1])
+        _worker_state["shm"] = shm # посилання, щоб пам'ять не звільнилась
+        _worker_state["data"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _worker_state["header"] = header
+    _worker_state["clip_extent"] = clip_extent
+
+def _worker_lines(lon_start, lat_start, settings, azimuths, lengths):
+    """
+    Обчислення частини віяла азимутів у процесі пулу (профілі - однією вибіркою з мапи).
+
+    :return: Список (промінь, профіль рельєфу) - профілі повертаються для кешу головного процесу.
+    """
+    profiles = terrain_profiles(lon_start, lat_start, _worker_state["data"], _worker_state["header"],
+        azimuths, settings["Радіус (m)"], settings["Динамічний крок"], _worker_state["clip_extent"], lengths)
+    return [(None, None) if profile is None else (line_from_profile(profile, azimuth, settings), profile)
+        for azimuth, profile in zip(azimuths, profiles)]
+
+def _cached_profiles(lon_start, lat_start, height_data, header, azimuths, settings, clip_extent, lengths, keys):
+    """
+    Профілі віяла: з кешу profile_cache, а відсутні - однією вибіркою (terrain_profiles),
+    після чого вони теж кешуються.
+
+    :param keys: Ключі етапу "profile" для азимутів (None - без кешу).
+    """
+    found = [profile_cache.get(key) if key is not None else (False, None) for key in keys]
+    missing = [index for index, (hit, _) in enumerate(found) if not hit]
+    computed = terrain_profiles(lon_start, lat_start, height_data, header, [azimuths[index] for index in missing],
+        settings["Радіус (m)"], settings["Динамічний крок"], clip_extent, [lengths[index] for index in missing])
+
+    profiles = [profile for _, profile in found]
+    for index, profile in zip(missing, computed):
+        profiles[index] = profile
+        if keys[index] is not None:
+            profile_cache.put(keys[index], profile)
+    return profiles
+
+def _remember_profiles(results, keys):
+    """
+    Збереження профілів, обчислених процесами пулу, у кеш головного процесу.
+
+    :param results: Ітератор (промінь, профіль) у порядку азимутів.
+    :param keys: Ключі кешу для тих самих азимутів (None - не кешувати).
+
+    :return: Ітератор променів.
+    """
+    for key, (ray, profile) in zip(keys, results):
+        if key is not None:
+            profile_cache.put(key, profile)
+        yield ray
+
+def _collect_rays(results, total, progress=None, cancelled=None, stream=None, keep_empty=False):
+    """
+    Збір променів у порядку азимутів з повідомленням про прогрес.
+
+    :param results: Ітератор результатів maths_for_line (None - промінь пропущено).
+    :param total: Кількість азимутів.
+    :param progress: Функція progress(виконано, всього), що викликається після кожного азимута.
+    :param cancelled: Функція без аргументів; якщо повертає True, збір припиняється.
+    :param stream: Функція stream(промінь), що отримує кожен готовий промінь одразу.
+    :param keep_empty: Чи залишати None для азимутів без даних рельєфу.
+
+    :return: Список променів або None, якщо розрахунок скасовано.
+    """
+    rays = []
+    for done, result in enumerate(results, 1):
+        if result:  # Пропуск None
+            rays.append(result)
+            if stream is not None:
+                stream(result)
+        elif keep_empty:
+            rays.append(None)
+        if progress is not None:
+            progress(done, total)
+        if cancelled is not None and cancelled():
+            return None
+    return rays
+
+def calculate_coverage(lon_start, lat_start, height_data, header, settings, workers=1, clip_extent=None,
+        progress=None, cancelled=None, stream=None, use_cache=True, keep_empty=False):
+    """
+    Розрахунок зони покриття передавача для всіх азимутів сегмента.
+
+    :param lon_start, lat_start: Розташування передавача.
+    :param height_data: масив даних з рельєфом місцевості або мозаїка плиток (dem.Mosaic).
+    :param header: Інформація про заголовок файлу рельєфу.
+    :param settings: Параметри вкладки {назва: значення}.
+    :param workers: Кількість процесів; 1 - послідовний розрахунок, None або 0 - усі ядра.
+    :param clip_extent: Межі, до яких обрізаються промені (див. maths_for_line).
+    :param progress: Функція progress(виконано, всього), що викликається після кожного азимута.
+    :param cancelled: Функція без аргументів для кооперативного скасування (True - зупинити).
+    :param stream: Функція stream(промінь) для поступового відображення: промені передаються
+        в порядку азимутів, щойно готові.
+    :param use_cache: Чи використовувати кеш профілів profile_cache (False - для разових розрахунків).
+    :param keep_empty: True - None на місці азимутів без даних рельєфу, тож список променів
+        відповідає coverage_azimuths(settings).
+
+    :return: Промені [lons, lats, P_rec_real_points, coverage_map_points] у порядку азимутів
+        або None, якщо розрахунок скасовано.
+    """
+    azimuths = coverage_azimuths(settings)
+    if not workers:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(azimuths))
+
+    # Якщо всі профілі рельєфу вже в кеші, лишається дешева арифметика - пул не потрібен
+    source = terrain_source_key(height_data, header) if use_cache else None
+    profile_keys = [profile_key(source, lon_start, lat_start, azimuth, settings["Радіус (m)"],
+        settings["Динамічний крок"], clip_extent) for azimuth in azimuths]
+    keys = [stage_key(key, "profile", settings) for key in profile_keys]
+    if source is not None and all(key in profile_cache for key in keys):
+        workers = 1
+
+    # Довжини всіх променів у межах мапи - одним обчисленням для віяла
+    lengths = ray_lengths(lon_start, lat_start, azimuths, settings["Радіус (m)"],
+        terrain_extent(height_data, header) if clip_extent is None else clip_extent)
+
+    ### Послідовний розрахунок: профілі віяла - однією вибіркою, далі кожен азимут ###
+    if workers <= 1:
+        profiles = _cached_profiles(lon_start, lat_start, height_data, header, azimuths, settings, clip_extent,
+            lengths, keys)
+        results = (None if profile is None else line_from_profile(profile, azimuth, settings, key)
+            for azimuth, profile, key in zip(azimuths, profiles, profile_keys))
+        return _collect_rays(results, len(azimuths), progress, cancelled, stream, keep_empty)
+
+    # Кожне завдання пулу - частина віяла, профілі якої вибираються разом
+    task = partial(_worker_lines, lon_start, lat_start, settings)
+    chunksize = max(1, len(azimuths) // (workers * 4))
+    chunks = [slice(start, start + chunksize) for start in range(0, len(azimuths), chunksize)]
+
+    def run_pool(initargs, shared=True):
+        initargs += (PROFILE_DUMP, GEODESIC, INTERPOLATION)
+        executor = coverage_pool(workers, initargs) if shared else _new_pool(workers, initargs)
+        # executor.map повертає результати в порядку азимутів
+        results = executor.map(task, [azimuths[chunk] for chunk in chunks], [lengths[chunk] for chunk in chunks])
+        try:
+            return _collect_rays(_remember_profiles(itertools.chain.from_iterable(results), keys), len(azimuths),
+                progress, cancelled, stream, keep_empty)
+        except BrokenProcessPool:
+            if shared:
+                shutdown_pool(wait=False) # наступний розрахунок створить пул заново
+            raise
+        finally:
+            # Після скасування частини віяла, що ще не почалися, відкидаються
+            results.close()
+            if not shared:
+                executor.shutdown(cancel_futures=True)
+
+    ### Паралельний розрахунок: мапа з кешу чи мозаїка відкриваються процесами напряму ###
+    if isinstance(height_data, dem.Mosaic):
+        # Кеш плиток віяла створюється тут, а не паралельно в кожному процесі
+        height_data.cache_tiles(fan_bounds(lon_start, lat_start, azimuths, settings["Радіус (m)"]))
+        return run_pool((("mosaic", height_data), None, None, header, clip_extent))
+    if isinstance(height_data, np.memmap) and height_data.filename:
+        source = ("memmap", height_data.filename, height_data.offset)
+        return run_pool((source, height_data.shape, height_data.dtype, header, clip_extent))
+
+    ### Паралельний розрахунок: мапа публікується у спільну пам'ять один раз ###
+    height_data = np.ascontiguousarray(height_data)
+    shm = shared_memory.SharedMemory(create=True, size=max(height_data.nbytes, 1))
+    try:
+        shared = np.ndarray(height_data.shape, dtype=height_data.dtype, buffer=shm.buf)
+        shared[...] = height_data
+        # Спільна пам'ять звільняється після розрахунку, тому й пул - лише для нього
+        rays = run_pool((("shm", shm.name), height_data.shape, height_data.dtype, header, clip_extent), shared=False)
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return rays
+
+def coverage_area(coverage_results, lon_start, lat_start):
+    """
+    Розрахунок приблизної площі покриття на криволінійній поверхні Землі за формулою площі Гаусса.
+
+    Багатокутник утворюють останні точки з покриттям кожного променя, відсортовані за азимутом.
+
+    :param coverage_results: Промені, отримані в результаті функції calculate_coverage.
+    :param lon_start, lat_start: Координати початку обчислень.
+
+    :return: Загальна площа покриття в км^2.
+    """
+    vertices = []
+    vertices.append([lat_start, lon_start])
+
+    for result in coverage_results:
+        i = 0
+        for coverage in result[3]:
+            if not coverage:
+                break
+            i += 1
+
+        if i == len(result[3]):
+            i -= 1
+
+        point = [result[1][i], result[0][i]]
+        vertices.append(point)
+
+    # Сортування вершин за годинниковою стрілкою
+    center = vertices[0]
+
+    def angle_from_north(point):
+        dx = point[1] - center[1]
+        dy = point[0] - center[0]
+        angle = np.arctan2(dx, dy)  # Кут в радіанах
+        return (2 * np.pi + angle) % (2 * np.pi)  # Нормалізація до [0, 2π]
+
+    # Сортування вершин (крім центру) за кутом з півночі
+    vertices = [center] + sorted(vertices[1:], key=angle_from_north) + [center]
+
+    geod = Geod(ellps="WGS84")
+    lons, lats = zip(*vertices)
+    polygon = Polygon(zip(lats, lons))
+    area, perimeter = geod.geometry_area_perimeter(orient(polygon))
+
+    return area / 1e6 # у км^2
+
+### Шаблони параметрів (templates/*.txt) ###
+
+def parse_template_file(file_path):
+    """
+    Розбір файлу шаблону для отримання назви вкладки, повної назви та налаштувань.
+
+    :param file_path: Шлях до файлу шаблону для аналізу.
+
+    :return: Кортеж, що складається з:
+        - name (str): Назва вкладки.
+        - full_name (str): Повна назва вкладки.
+        - settings (OrderedDict): Налаштування, де ключі — імена параметрів, а значення — кортежі з чотирьох чисел.
+    :raises ValueError: Якщо файл не відповідає формату шаблону.
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        lines = file.readlines()
+
+    if len(lines) < 2:
+        raise ValueError(f"File {file_path} is missing required header lines.")
+
+    # Отримання назви та повної назви
+    name = lines[0].strip().split(":")[1].strip()
+    full_name = lines[1].strip().split(":")[1].strip()
+
+    # Отримання налаштувань
+    settings = OrderedDict()
+    for line in lines[2:]:
+        if line.strip():
+            parts = line.strip().split(":")
+            if len(parts) != 2:
+                raise ValueError(f"Invalid parameter line in {file_path}: {line}")
+
+            param_name = parts[0].strip()
+            values = list(map(float, parts[1].split(",")))
+            if len(values) != 4:
+                raise ValueError(f"Invalid parameter values in {file_path}: {line}")
+
+            settings[param_name] = tuple(values)
+
+    return name, full_name, settings
+
+def template_values(settings):
+    """
+    Параметри шаблону {назва: (default, min, max, step)} у форматі вкладки {назва: значення}.
+    """
+    return {name: values[0] for name, values in settings.items()}
+
+### Растровий режим: покриття у вигляді сітки, вирівняної з мапою ###
+
+RASTER_NODATA = -9999
+EARTH_RADIUS_AREA = 6371007.2 # Радіус сфери рівної площі (м)
+
+def raster_grid(header, bounds, factor=1, max_cells=None):
+    """
+    Заголовок растра, вирівняного з сіткою мапи, що покриває задані межі.
+
+    :param header: Інформація про заголовок файлу рельєфу.
+    :param bounds: Межі, які має покрити растр (x_min, x_max, y_min, y_max).
+    :param factor: У скільки разів комірка растра більша за комірку мапи.
+    :param max_cells: Максимальна кількість комірок по довшій стороні (збільшує factor за потреби).
+
+    :return: Заголовок у форматі .asc (ncols, nrows, xllcorner, yllcorner, cellsize, NODATA_value).
+    """
+    x_min, x_max, y_min, y_max = bounds
+    cellsize = header['cellsize']
+    if max_cells:
+        span = max(x_max - x_min, y_max - y_min)
+        factor = max(factor, math.ceil(span / (cellsize * max_cells)))
+    cell = cellsize * factor
+
+    # Прив'язка лівого нижнього кута до вузлів сітки мапи
+    x0 = header['xllcorner'] + math.floor((x_min - header['xllcorner']) / cell) * cell
+    y0 = header['yllcorner'] + math.floor((y_min - header['yllcorner']) / cell) * cell
+    return {
+        "ncols": max(1, math.ceil((x_max - x0) / cell)),
+        "nrows": max(1, math.ceil((y_max - y0) / cell)),
+        "xllcorner": x0,
+        "yllcorner": y0,
+        "cellsize": cell,
+        "NODATA_value": RASTER_NODATA,
+    }
+
+def rays_bounds(coverage_results, lon_start, lat_start):
+    """
+    Межі, що охоплюють передавач та всі промені: (x_min, x_max, y_min, y_max).
+    """
+    lons = [lon_start] + [np.min(ray[0]) for ray in coverage_results] + [np.max(ray[0]) for ray in coverage_results]
+    lats = [lat_start] + [np.min(ray[1]) for ray in coverage_results] + [np.max(ray[1]) for ray in coverage_results]
+    return min(lons), max(lons), min(lats), max(lats)
+
+def rasterize_coverage(coverage_results, lon_start, lat_start, grid):
+    """
+    Перенесення рівня сигналу з променів на растр.
+
+    Для кожної комірки визначається найближчий за азимутом промінь та положення
+    вздовж нього; P_rec лінійно інтерполюється між сусідніми точками променя.
+    Так проміжки між променями, що зростають з відстанню, заповнюються.
+
+    :param coverage_results: Промені [lons, lats, P_rec_real_points, coverage_map_points].
+    :param lon_start, lat_start: Розташування передавача.
+    :param grid: Заголовок растра (див. raster_grid).
+
+    :return: Масив P_rec (float32) форми (nrows, ncols), перший рядок - північ; NaN поза променями.
+    """
+    nrows, ncols, cell = grid['nrows'], grid['ncols'], grid['cellsize']
+    power = np.full((nrows, ncols), np.nan, dtype=np.float32)
+    rays = [ray for ray in coverage_results if len(ray[2])]
+    if not rays:
+        return power
+
+    # Локальна площина навколо передавача: довгота стискається на cos(широти)
+    scale = math.cos(math.radians(lat_start))
+
+    # Промені в один масив з доповненням NaN (різна довжина після обрізання)
+    lengths = np.array([len(ray[2]) for ray in rays])
+    padded = np.full((len(rays), lengths.max()), np.nan)
+    ends_x = np.empty(len(rays))
+    ends_y = np.empty(len(rays))
+    for i, ray in enumerate(rays):
+        padded[i, :lengths[i]] = ray[2]
+        ends_x[i] = (ray[0][-1] - lon_start) * scale
+        ends_y[i] = ray[1][-1] - lat_start
+    ray_azimuths = np.arctan2(ends_x, ends_y)
+    ray_lengths = np.hypot(ends_x, ends_y)
+
+    order = np.argsort(ray_azimuths)
+    ray_azimuths = ray_azimuths[order]
+    ray_lengths = ray_lengths[order]
+    lengths = lengths[order]
+    padded = padded[order]
+
+    # Допустиме кутове відхилення комірки від променя - половина кроку між променями
+    if len(rays) > 1:
+        gaps = np.diff(np.concatenate([ray_azimuths, ray_azimuths[:1] + 2 * np.pi]))
+        tolerance = np.median(gaps) / 2 * 1.01
+    else:
+        tolerance = np.radians(0.5)
+
+    # Центри комірок
+    xs = grid['xllcorner'] + (np.arange(ncols) + 0.5) * cell
+    ys = grid['yllcorner'] + (nrows - np.arange(nrows) - 0.5) * cell
+    cell_x = (xs[None, :] - lon_start) * scale
+    cell_y = ys[:, None] - lat_start
+    cell_azimuths = np.arctan2(cell_x, cell_y)
+    cell_radius = np.hypot(cell_x, cell_y)
+
+    # Найближчий промінь за азимутом (з урахуванням переходу через ±π)
+    right = np.searchsorted(ray_azimuths, cell_azimuths) % len(rays)
+    left = (right - 1) % len(rays)
+    diff_right = np.abs(np.angle(np.exp(1j * (cell_azimuths - ray_azimuths[right]))))
+    diff_left = np.abs(np.angle(np.exp(1j * (cell_azimuths - ray_azimuths[left]))))
+    nearest = np.where(diff_left < diff_right, left, right)
+    angular_gap = np.minimum(diff_left, diff_right)
+
+    # Точки променя рівномірні: k-та точка на відстані (k + 1) / len від довжини променя
+    position = cell_radius / ray_lengths[nearest] * lengths[nearest] - 1
+    valid = (angular_gap <= tolerance) & (position <= lengths[nearest] - 1)
+    position = np.clip(position, 0, None)
+
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, lengths[nearest] - 1)
+    lower = np.minimum(lower, lengths[nearest] - 1)
+    weight = position - lower
+    values = padded[nearest, lower] * (1 - weight) + padded[nearest, upper] * weight
+
+    power[valid] = values[valid]
+    return power
+
+def coverage_raster(coverage_results, lon_start, lat_start, header, max_cells=None):
+    """
+    Растр покриття за променями: сітка мапи, що охоплює всі промені.
+
+    :param coverage_results: Промені, отримані в результаті функції calculate_coverage.
+    :param lon_start, lat_start: Координати передавача.
+    :param header: Інформація про заголовок файлу рельєфу.
+    :param max_cells: Максимальна кількість комірок по довшій стороні (див. raster_grid).
+
+    :return: (power, grid) - растр P_rec (NaN - немає даних) та його заголовок.
+    """
+    bounds = rays_bounds(coverage_results, lon_start, lat_start)
+    grid = raster_grid(header, bounds, max_cells=max_cells)
+    return rasterize_coverage(coverage_results, lon_start, lat_start, grid), grid
+
+def raster_cell_areas(grid):
+    """
+    Площа комірок кожного рядка растра на сфері (км²), форма (nrows, 1).
+    """
+    cell = math.radians(grid['cellsize'])
+    top = grid['yllcorner'] + grid['nrows'] * grid['cellsize']
+    edges = np.radians(top - np.arange(grid['nrows'] + 1) * grid['cellsize'])
+    return (EARTH_RADIUS_AREA ** 2 * cell * (np.sin(edges[:-1]) - np.sin(edges[1:])) / 1e6)[:, None]
+
+def raster_coverage_area(power, grid, threshold):
+    """
+    Точна площа комірок растра, де P_rec не нижче порогу (км²).
+
+    :param power: Растр P_rec (див. rasterize_coverage).
+    :param grid: Заголовок растра.
+    :param threshold: Чутливість приймача (дБВт).
+    """
+    covered = np.nan_to_num(power, nan=-np.inf) >= threshold
+    return float(np.sum(covered * raster_cell_areas(grid)))
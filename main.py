@@ -3,7 +3,7 @@ import os
 import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
-from matplotlib.colors import Normalize, LinearSegmentedColormap
+from matplotlib.colors import Normalize, LinearSegmentedColormap, LightSource
 from matplotlib.cm import ScalarMappable
 from matplotlib.backends.backend_qtagg import (
     FigureCanvasQTAgg as FigureCanvas,
@@ -14,20 +14,20 @@ from PyQt6.QtWidgets import *
 from PyQt6 import QtCore, QtGui
 from PyQt6.QtCore import Qt
 import itertools
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
-from collections import OrderedDict
+import time
+import logging
+import multiprocessing
+from functools import partial, lru_cache
 
 import maths # Допоміжний файл з математикою 
+import engine # Обчислення покриття без інтерфейсу
+import dem # Читання мап та їх бінарний кеш
+import viewshed # Покриття розгорткою кільцями
 import math # пітонівська бібліотека
-from scipy.interpolate import make_interp_spline
 
 import utm
 import mgrs
 
-from pyproj import Geod
-from shapely.geometry import Polygon, LineString, box
-from shapely.ops import orient
-
 # from pprint import pprint
 
 # .py -> .exe         --noconsole
@@ -36,6 +36,22 @@ from shapely.ops import orient
 MAPS_FOLDER = "maps/"
 TEMPLATES_FOLDER = "templates/"
 SAVE_COLUMNS = 5
+COVERAGE_WORKERS = os.cpu_count() # Кількість процесів для обчислення покриття (1 - послідовно)
+COVERAGE_OUTPUT = "rays" # Відображення покриття: "rays" - відрізки променів, "raster" - растр, "viewshed" - растр розгорткою кільцями
+RASTER_MAX_CELLS = 1000 # Максимальний розмір растра покриття (комірок по довшій стороні)
+STREAM_INTERVAL = 0.1 # Мінімальний інтервал між частковими рендерами покриття (с)
+MAP_DISPLAY_CELLS = 600 # Бажаний розмір зображення мапи (комірок по довшій стороні); рівень піраміди не грубший
+MAP_OVERVIEW = "mean" # Агрегація рівнів піраміди для відображення: "mean" - середня висота, "max" - найвища точка
+MAP_HILLSHADE = False # Відмивка рельєфу (тіні схилів) на зображенні мапи
+HOVER_INTERVAL_MS = 50 # Мінімальний інтервал між оновленнями статус бару під час наведення (мс)
+HOVER_CACHE_SIZE = 65536 # Кількість комірок мапи, для яких зберігається висота
+MAP_REDRAW_MS = 50 # Пауза після зміни масштабу чи зсуву мапи до перемальовки рельєфу (мс)
+LIVE_PREVIEW = False # Живий перегляд: автоматичний перерахунок після зміни параметрів (перемикач під мапою)
+LIVE_DEBOUNCE_MS = 150 # Пауза після зміни параметра до грубого проходу (мс)
+LIVE_REFINE_MS = 700 # Пауза без змін до повного проходу (мс)
+LIVE_AZIMUTH_STEP = 5 # Мінімальний крок азимутів грубого проходу (°)
+LIVE_STEP_FACTOR = 4 # У скільки разів грубий прохід збільшує "Динамічний крок" (і зменшує растр)
+LOG_LEVEL = "INFO" # Рівень журналу в консолі: "DEBUG", "INFO", "WARNING", "ERROR"
 # Налаштування шаблонів за змовчуавнням
 DEFAULT_TAB_SETTINGS = {
     "Частота (GHz)": (3, 0.03, 6, 0.01), 
@@ -58,6 +74,10 @@ DEFAULT_TAB_SETTINGS = {
     "Чутливість приймача (dbW)": (-110, -300, 100, 1),
 }
 
+logger = logging.getLogger("main")
+
+MGRS_CONVERTER = mgrs.MGRS() # Один конвертер на всю програму
+
 def latlon_to_utm(lat, lon):
     """
     Конвертація картографічної проєкції в UTM
@@ -78,8 +98,51 @@ def latlon_to_mgrs(lat, lon):
     :return: Координати MGRS, приклад:
         36U UA 2424 9160
     """
-    m = mgrs.MGRS()
-    return m.toMGRS(lat, lon)
+    return MGRS_CONVERTER.toMGRS(lat, lon)
+
+@lru_cache(maxsize=None)
+def terrain_palette():
+    """
+    Кольори рельєфу, побудовані один раз: шкала terrain без синьої частини.
+
+    :return: (cmap, lut, sea) - шкала для colorbar, таблиця 256 кольорів RGBA (uint8)
+        та колір моря RGBA (uint8).
+    """
+    terrain_colors = plt.cm.terrain(np.linspace(0.22, 1, 256))  # Remove blue (lower 25% of cmap)
+    cmap = LinearSegmentedColormap.from_list("custom_terrain", terrain_colors)
+    lut = np.round(cmap(np.arange(cmap.N)) * 255).astype(np.uint8)
+    sea = np.round(np.array(plt.cm.plasma(0.0)) * 255).astype(np.uint8) # колір бінарного шару моря
+    return cmap, lut, sea
+
+def composite_terrain(data, header, norm, hillshade=False):
+    """
+    Зображення рельєфу та моря одним масивом RGBA (uint8) за один прохід через таблицю кольорів.
+
+    :param data: Висоти фрагмента мапи.
+    :param header: Заголовок фрагмента (розмір комірки для відмивки).
+    :param norm: Normalize шкали висот (та сама, що й у colorbar).
+    :param hillshade: Чи додавати відмивку рельєфу (освітлення з північного заходу).
+
+    :return: Масив форми (рядки, стовпці, 4).
+    """
+    _, lut, sea = terrain_palette()
+    heights = np.asarray(data, dtype=np.float32)
+
+    # Індекс у таблиці: те саме, що cmap(norm(висота)), значення поза шкалою - крайні кольори
+    scale = len(lut) / (norm.vmax - norm.vmin) if norm.vmax > norm.vmin else 0.0
+    index = np.clip(np.nan_to_num(heights - norm.vmin) * scale, 0, len(lut) - 1).astype(np.uint8)
+    rgba = lut[index]
+
+    if hillshade:
+        cell_y = math.radians(header['cellsize']) * viewshed.EARTH_RADIUS
+        cell_x = cell_y * math.cos(math.radians(header['yllcorner'] + header['nrows'] * header['cellsize'] / 2))
+        shade = LightSource(azdeg=315, altdeg=45).hillshade(heights, dx=cell_x, dy=cell_y)
+        rgba[..., :3] = rgba[..., :3] * (0.6 + 0.4 * shade[..., None])
+
+    # Море (припускаємо, що рівень моря ≤ 0); комірки без даних прозорі
+    rgba[heights <= 0] = sea
+    rgba[np.isnan(heights)] = 0
+    return rgba
 
 class Ui_MainWindow(object):
     """
@@ -229,9 +292,20 @@ class Ui_MainWindow(object):
         if not os.path.exists(maps_folder):
             os.makedirs(maps_folder)
 
-        asc_files = [f for f in os.listdir(maps_folder) if f.endswith(".asc")]
+        # Індекс із заголовків мап: не потребує читання самих висот
+        self.map_catalog = dem.MapCatalog(maps_folder).refresh()
+
+        asc_files = self.map_catalog.names()
         if asc_files:
             self.map_selector.addItems(asc_files)
+            for i, name in enumerate(asc_files):
+                entry = self.map_catalog.entry(name)
+                x_min, x_max, y_min, y_max = entry["extent"]
+                self.map_selector.setItemData(i,
+                    f"Довгота: {x_min:.3f} - {x_max:.3f}, Широта: {y_min:.3f} - {y_max:.3f}\n"
+                    f"Розмір: {entry['shape'][1]} x {entry['shape'][0]}, крок {entry['cellsize']}\n"
+                    f"Файл: {entry['size'] / 2**20:.1f} MB",
+                    Qt.ItemDataRole.ToolTipRole)
         else:
             self.map_selector.addItem("No maps found")
 
@@ -246,10 +320,11 @@ class Ui_MainWindow(object):
             if os.path.exists(map_path):
                 # Ініціалізація MapArea вибраним файлом
                 if self.map_area:
+                    self.map_area.stop_worker() # Потік не можна знищувати, поки він працює
                     self.splitter.widget(1).deleteLater()
                 self.map_area = MapArea(self, file_path=map_path, tabWidget=self.tabWidget, tabManager=self.tabManager)
                 self.splitter.addWidget(self.map_area)
-                print(f"Мапу промальовано: {map_path}")
+                logger.info("Мапу промальовано: %s", map_path)
                 self.statusbar.showMessage(f"Мапу промальовано: {map_path}")
 
 
@@ -280,34 +355,9 @@ class Ui_MainWindow(object):
             Якщо розбір не вдається, повертається (None, None, None).
         """
         try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                lines = file.readlines()
-
-            if len(lines) < 2:
-                raise ValueError(f"File {file_path} is missing required header lines.")
-
-            # Отримання назви та повної назви
-            name = lines[0].strip().split(":")[1].strip()
-            full_name = lines[1].strip().split(":")[1].strip()
-
-            # Отримання налаштувань
-            settings = OrderedDict()
-            for line in lines[2:]:
-                if line.strip():
-                    parts = line.strip().split(":")
-                    if len(parts) != 2:
-                        raise ValueError(f"Invalid parameter line in {file_path}: {line}")
-                    
-                    param_name = parts[0].strip()
-                    values = list(map(float, parts[1].split(",")))
-                    if len(values) != 4:
-                        raise ValueError(f"Invalid parameter values in {file_path}: {line}")
-                    
-                    settings[param_name] = tuple(values)
-
-            return name, full_name, settings
+            return engine.parse_template_file(file_path)
         except Exception as e:
-            print(f"Error parsing {file_path}: {e}")
+            logger.error("Error parsing %s: %s", file_path, e)
             return None, None, None
 
     def ask_tab_creation(self):
@@ -350,14 +400,14 @@ class Ui_MainWindow(object):
                         values_str = ", ".join(map(str, values))
                         preset_file.write(f"{param_name}: {values_str}\n")
 
-                print(f"Пресет '{preset_name}' успішно збережено в файл {preset_file_path}")
+                logger.info("Пресет '%s' успішно збережено в файл %s", preset_name, preset_file_path)
                 self.statusbar.showMessage(f"Пресет '{preset_name}' успішно збережено в файл {preset_file_path}")
             except Exception as e:
-                print(f"Помилка при збереженні пресету: {e}")
+                logger.error("Помилка при збереженні пресету: %s", e)
                 self.statusbar.showMessage(f"Помилка при збереженні пресету: {e}")
 
         else:
-            print("Будь ласка, введіть назву пресету.")
+            logger.warning("Будь ласка, введіть назву пресету.")
             self.statusbar.showMessage(f"Будь ласка, введіть назву пресету.")
 
         # Приховати інпути
@@ -373,7 +423,7 @@ class Ui_MainWindow(object):
 
         # Доступ до налаштувань у вкладці
         tab_settings = self.tabManager.get_tab_settings(tab)
-        print(tab_settings)
+        logger.debug("%s", tab_settings)
         last_point = self.map_area.get_last_point()
 
         # Вивід збережень (залежить від нагенерованої кількості в автоматизації)
@@ -389,8 +439,8 @@ class Ui_MainWindow(object):
 
         for key, value in tab_settings['sliders'].items():
             if key == "Висота передавача (m)":
-                height_there = maths.get_height_for_coordinates(lon, lat, self.map_area.data, self.map_area.header)
-                labels_text.append(f"Альтитуда передавача (м): {value + height_there}")
+                heights_there, _ = engine.sample_heights([lon], [lat], self.map_area.data, self.map_area.header)
+                labels_text.append(f"Альтитуда передавача (м): {value + heights_there[0]:.1f}")
                 continue
             labels_text.append(f"{key}: {value}")
         # labels_text.append(f"Тип місцевості: {tab_settings['comboBox1']}")
@@ -493,6 +543,62 @@ class Ui_MainWindow(object):
         return False
 
 
+class CoverageWorker(QtCore.QThread):
+    """
+    Обчислення покриття у фоновому потоці, щоб інтерфейс не зависав на час розрахунку.
+    Результат передається в потік інтерфейсу сигналом computed.
+    """
+    progress = QtCore.pyqtSignal(int, int) # (виконано, всього)
+    rays = QtCore.pyqtSignal(object)       # пакет готових променів для поступового рендеру
+    computed = QtCore.pyqtSignal(object)   # результат або None, якщо обчислення скасовано
+    failed = QtCore.pyqtSignal(str)        # текст помилки
+
+    def __init__(self, compute, parent=None, streaming=False):
+        """
+        :param compute: Функція compute(progress=..., cancelled=...), що виконує розрахунок.
+        :param streaming: Чи передавати промені пакетами (compute отримує також stream=...).
+        """
+        super().__init__(parent)
+        self.compute = compute
+        self.streaming = streaming
+        self.cancel_requested = False
+        self.pending_rays = []  # Промені, ще не передані сигналом rays
+        self.last_emit = 0.0    # Час останньої передачі пакета (time.monotonic)
+
+    def cancel(self):
+        """
+        Кооперативне скасування: розрахунок зупиняється після поточного азимута.
+        """
+        self.cancel_requested = True
+
+    def stream(self, ray):
+        """
+        Накопичення променів; пакет передається не частіше, ніж раз на STREAM_INTERVAL секунд
+        (перший промінь - одразу).
+        """
+        self.pending_rays.append(ray)
+        if time.monotonic() - self.last_emit >= STREAM_INTERVAL:
+            self.flush_rays()
+
+    def flush_rays(self):
+        if self.pending_rays:
+            self.rays.emit(self.pending_rays)
+            self.pending_rays = []
+        self.last_emit = time.monotonic()
+
+    def run(self):
+        kwargs = {"progress": self.progress.emit, "cancelled": lambda: self.cancel_requested}
+        if self.streaming:
+            kwargs["stream"] = self.stream
+        try:
+            result = self.compute(**kwargs)
+        except Exception as error:
+            self.failed.emit(str(error))
+            return
+        if not self.cancel_requested:
+            self.flush_rays() # Решта променів - до фінального результату
+        self.computed.emit(None if self.cancel_requested else result)
+
 class MapArea(QWidget):
     """
     Рендер топографії та обчислень пов'язаних із нею
@@ -508,14 +614,24 @@ class MapArea(QWidget):
         self.collections = [[None] * SAVE_COLUMNS, [None] * SAVE_COLUMNS] # Список пучків обрахованих відрізків
         self.last_collections_length = 0
         self.last_collection = None
+        self.last_raster = None # Останній растр покриття (P_rec, заголовок)
+        self.worker = None # Фоновий розрахунок покриття (CoverageWorker), якщо триває
+        self.streamed_rays = None # Кількість променів поступового рендеру (None - рендер не почато)
 
         # Читання мапи
         self.file_path = file_path
         self.data, self.header = self.load_asc(self.file_path)
 
-        # Зменшення вибірки
-        self.downsample_factor = 10 # Відрегулюйте для продуктивності
-        self.data_downsampled = self.downsample_data(self.data, self.downsample_factor)
+        # Усі мапи теки як одна поверхня: промені не обриваються на краю цієї мапи,
+        # а в її межах висоти беруться з неї, навіть якщо сусідня плитка перекриває її
+        self.terrain = dem.Mosaic.from_folder(os.path.dirname(self.file_path), primary=self.file_path)
+
+        # Піраміда оглядових рівнів мапи (зберігається поруч із мапою)
+        self.pyramid = dem.Pyramid(self.file_path, self.data, self.header)
+
+        # Зменшення вибірки: рівень піраміди замість проріджування
+        self.downsample_factor, self.data_downsampled, self.header_downsampled = self.pyramid.level_for(
+            max(self.data.shape) / MAP_DISPLAY_CELLS, MAP_OVERVIEW)
 
         # Matplotlib Figure
         self.figure, self.ax = plt.subplots()
@@ -524,10 +640,24 @@ class MapArea(QWidget):
         self.canvas = FigureCanvas(self.figure)
         self.toolbar = NavigationToolbar(self.canvas, self)
 
+        # Наведення: оновлення статус бару з обмеженою частотою та кешем комірок
+        self.hover_point = None # Остання ще не показана точка наведення
+        self.hover_tx_height = None # "Висота передавача (m)" поточної вкладки (None - перечитати)
+        self.cell_height = lru_cache(maxsize=HOVER_CACHE_SIZE)(self._cell_height)
+        self.hover_timer = QtCore.QTimer(self)
+        self.hover_timer.setSingleShot(True)
+        self.hover_timer.timeout.connect(self.update_hover)
         self.canvas.mpl_connect('motion_notify_event', self.on_hover)
+        if self.tabWidget is not None:
+            self.tabWidget.currentChanged.connect(self.tab_changed)
+
+        # Перемальовка рельєфу після зміни масштабу (одна на серію змін меж)
+        self.terrain_timer = QtCore.QTimer(self)
+        self.terrain_timer.setSingleShot(True)
+        self.terrain_timer.timeout.connect(self.redraw_terrain)
 
         # Plot
-        self.plot_asc(self.data_downsampled, self.downsample_factor)
+        self.plot_asc(self.data_downsampled, self.header_downsampled)
 
         # Макет
         layout = QVBoxLayout()
@@ -535,9 +665,24 @@ class MapArea(QWidget):
         self.pushButton_2 = QPushButton("Обчислити", self)
         self.pushButton_2.clicked.connect(lambda: self.do_signal(self.header, self.data)) # Змоделювати пристрій
 
+        # Живий перегляд: перерахунок після зміни параметрів без натискання "Обчислити"
+        self.live_checkbox = QCheckBox("Живий перегляд", self)
+        self.live_checkbox.setChecked(LIVE_PREVIEW)
+        self.live_checkbox.toggled.connect(self.toggle_live_preview)
+        self.live_timer = QtCore.QTimer(self)   # грубий прохід після короткої паузи
+        self.live_timer.setSingleShot(True)
+        self.live_timer.timeout.connect(lambda: self.start_worker(self.header, self.data, coarse=True))
+        self.refine_timer = QtCore.QTimer(self) # повний прохід, коли зміни припинились
+        self.refine_timer.setSingleShot(True)
+        self.refine_timer.timeout.connect(lambda: self.start_worker(self.header, self.data))
+
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(self.pushButton_2)
+        button_layout.addWidget(self.live_checkbox)
+
         layout.addWidget(self.toolbar)
         layout.addWidget(self.canvas)
-        layout.addWidget(self.pushButton_2)
+        layout.addLayout(button_layout)
         self.setLayout(layout)
 
         # Клік
@@ -553,102 +698,99 @@ class MapArea(QWidget):
         :return data: Мапа рельєфу.
         :return header: Інформація про заголовок файлу рельєфу.
         """
-        header = {}
-        with open(file_path, 'r') as file:
-            for _ in range(6):
-                line = file.readline()
-                key, value = line.split()
-                header[key] = float(value) if '.' in value else int(value)
-
-            data = np.loadtxt(file, dtype=float)
+        def show_progress(fraction):
+            self.parent.statusbar.showMessage(f"Завантаження мапи: {fraction:.0%}")
+            QApplication.processEvents() # Перемальовка статус бару під час розбору
 
-        return data, header
-
-    def downsample_data(self, data, factor):
-        """
-        Зменшення вибірки за заданим фактором
-        """
-        return data[::factor, ::factor]
+        return dem.load_asc(file_path, progress=show_progress)
 
     def on_hover(self, event):
         """
         Відображення широти, довготи, та MGRS координат при наведенні.
+        Подія лише запам'ятовує координати: статус бар оновлюється не частіше
+        ніж раз на HOVER_INTERVAL_MS (див. update_hover).
 
         :param event: Опис взаємодії користувача з графіком matplotlib.
         """
         if event.inaxes == self.ax and event.xdata is not None and event.ydata is not None:
-            lon, lat = event.xdata, event.ydata # координати ділянки
+            self.hover_point = (event.xdata, event.ydata) # координати ділянки
+            if not self.hover_timer.isActive():
+                self.hover_timer.start(HOVER_INTERVAL_MS)
 
-            # Отримати індекси матриці з координат 
-            x_index = int((lon - self.header['xllcorner']) / self.header['cellsize'])
-            y_index = int((self.header['yllcorner'] - lat) / self.header['cellsize'])
+    def update_hover(self):
+        """
+        Оновлення статус бару для останньої точки наведення.
+        """
+        if self.hover_point is None or not self.parent.statusbar:
+            return
+        lon, lat = self.hover_point
+        self.hover_point = None
+
+        # Отримати індекси матриці з координат
+        inside, rows, cols = dem.cell_indices(self.header, lon, lat)
+        if not inside:
+            return
+        surface_height = self.cell_height(int(rows), int(cols))
+        mgrs = latlon_to_mgrs(lat, lon) # MGRS самої точки наведення, а не центру комірки
+
+        # Висота передавача з налаштувань (перечитується лише після зміни параметрів)
+        if self.hover_tx_height is None:
+            current_tab_name = self.tabWidget.tabText(self.tabWidget.currentIndex())
+            self.hover_tx_height = self.tabManager.get_tab_settings(current_tab_name)["sliders"]["Висота передавача (m)"]
+        transmitter_height = surface_height + self.hover_tx_height
+
+        # Статус бар
+        self.parent.statusbar.showMessage(
+            f"Довгота: {lon:.5f}, Паралель: {lat:.5f} || MGRS: {mgrs} || "
+            f"Висота поверхні: {surface_height:.2f} м || "
+            f"Висота передавача (абсолютна): {transmitter_height:.2f} м"
+        )
 
-            # Висота поверхні в точці наведення
-            surface_height = self.data[y_index, x_index]
+    def _cell_height(self, row, col):
+        """
+        Висота комірки мапи (результат кешується для кожної комірки).
+        """
+        return float(self.data[row, col])
 
-            # Висота передавача з налаштувань
-            current_tab_index = self.tabWidget.currentIndex()
-            current_tab_name = self.tabWidget.tabText(current_tab_index)
-            transmitter_height_settings = self.tabManager.get_tab_settings(current_tab_name)["sliders"]["Висота передавача (m)"]
-            transmitter_height = surface_height + transmitter_height_settings
+    def settings_changed(self):
+        """
+        Реакція на зміну параметрів вкладки: скидання збереженої висоти передавача
+        для наведення та живий перегляд.
+        """
+        self.hover_tx_height = None
+        self.schedule_live_update()
 
-            # Статус бар
-            if self.parent.statusbar:
-                mgrs = latlon_to_mgrs(lat, lon)  # Конвертація в MGRS
-                self.parent.statusbar.showMessage(
-                    f"Довгота: {lon:.5f}, Паралель: {lat:.5f} || MGRS: {mgrs} || "
-                    f"Висота поверхні: {surface_height:.2f} м || "
-                    f"Висота передавача (абсолютна): {transmitter_height:.2f} м"
-                )
+    def tab_changed(self, index):
+        """
+        Перемикання вкладки змінює параметри так само, як слайдер.
+        """
+        self.settings_changed()
 
-    def plot_asc(self, data, downsample_factor):
+    def plot_asc(self, data, header):
         """
         Відображення мапи з розрізненням рельєфу та моря.
 
-        :param data: Дані про висоти карти.
-        :param downsample_factor: Коефіцієнт дискретизації координат.
+        :param data: Дані про висоти карти (рівень піраміди).
+        :param header: Заголовок рівня (визначає межі зображення).
         """
         self.ax.clear()
 
-        # Коригування роздільної здатності на основі коефіцієнта
-        cellsize_adjusted = self.header['cellsize'] * downsample_factor
-        extent = [
-            self.header['xllcorner'], 
-            self.header['xllcorner'] + cellsize_adjusted * data.shape[1], 
-            self.header['yllcorner'], 
-            self.header['yllcorner'] + cellsize_adjusted * data.shape[0],
-        ]
-
-        # Маскування морських ділянок (припускаємо, що рівень моря ≤ 0)
-        sea_mask = data <= 0
-        terrain_data = np.ma.masked_where(sea_mask, data)
-
-        terrain_cmap = plt.cm.terrain
-        terrain_colors = terrain_cmap(np.linspace(0.22, 1, 256))  # Remove blue (lower 25% of cmap)
-        custom_cmap = LinearSegmentedColormap.from_list("custom_terrain", terrain_colors)
-
-        terrain_norm = Normalize(vmin=max(data.min() *2, 1), vmax=data.max() / 2)
-
-        # Рельєф місцевості
-        terrain = self.ax.imshow(
-            terrain_data, 
-            cmap=custom_cmap,
-            norm=terrain_norm,
-            origin="upper", 
-            extent=extent
-        )
+        extent = list(dem.header_extent(header))
+
+        # Шкала висот спільна для зображення (усіх фрагментів) та colorbar
+        self.terrain_norm = Normalize(vmin=max(data.min() *2, 1), vmax=data.max() / 2)
 
-        # Побудова моря в білому кольорі
-        sea = self.ax.imshow(
-            np.where(sea_mask, 1, np.nan),  # Бінарне море
-            cmap="plasma",  # Білий
+        # Рельєф місцевості та море одним зображенням RGBA
+        self.terrain_image = self.ax.imshow(
+            composite_terrain(data, header, self.terrain_norm, MAP_HILLSHADE),
             origin="upper", 
-            extent=extent, 
-            alpha=1
+            extent=extent
         )
 
         # Додавання colorbar-у для рельєфу
-        cb = self.figure.colorbar(terrain, ax=self.ax, orientation='vertical', label='Elevation (m)')
+        cmap, _, _ = terrain_palette()
+        cb = self.figure.colorbar(ScalarMappable(norm=self.terrain_norm, cmap=cmap), ax=self.ax,
+            orientation='vertical', label='Elevation (m)')
         
         # Темна тема
         cb.ax.tick_params(labelcolor="white")
@@ -656,8 +798,59 @@ class MapArea(QWidget):
         self.ax.set_title("Карта", color="white")
         self.ax.tick_params(labelcolor='white')
 
+        # Межі задає користувач (масштаб панелі інструментів), а не нові шари
+        self.ax.set_autoscale_on(False)
+        self.terrain_view = (header['cellsize'], extent) # рівень і межі показаного фрагмента
+        self.ax.callbacks.connect('xlim_changed', self.schedule_terrain_redraw)
+        self.ax.callbacks.connect('ylim_changed', self.schedule_terrain_redraw)
+
         self.canvas.draw()
 
+    def schedule_terrain_redraw(self, ax=None):
+        """
+        Зміна меж мапи (масштаб, зсув): перемальовка рельєфу відкладається на MAP_REDRAW_MS,
+        тож серія змін під час перетягування дає одну перемальовку.
+        """
+        self.terrain_timer.start(MAP_REDRAW_MS)
+
+    def redraw_terrain(self):
+        """
+        Перемальовка рельєфу лише для видимої частини мапи з рівня піраміди,
+        що відповідає масштабу (за великого наближення - повна роздільна здатність).
+        Зображення рельєфу оновлюється на місці, без побудови нових шарів.
+        """
+        x_min, x_max = sorted(self.ax.get_xlim())
+        y_min, y_max = sorted(self.ax.get_ylim())
+        width, height = self.ax.bbox.width, self.ax.bbox.height
+        if width <= 0 or height <= 0:
+            return
+
+        # Комірок мапи на піксель екрана
+        cells = max((x_max - x_min) / width, (y_max - y_min) / height) / self.header['cellsize']
+        factor, data, header = self.pyramid.level_for(cells, MAP_OVERVIEW)
+
+        # Показаний фрагмент того ж рівня ще покриває видиму область
+        cellsize, (view_x_min, view_x_max, view_y_min, view_y_max) = self.terrain_view
+        if cellsize == header['cellsize'] and view_x_min <= x_min and x_max <= view_x_max \
+                and view_y_min <= y_min and y_max <= view_y_max:
+            return
+
+        # Фрагмент із запасом на половину видимої області з кожного боку (для зсуву без перемальовки)
+        margin_x, margin_y = (x_max - x_min) / 2, (y_max - y_min) / 2
+        window = dem.crop(data, header, (x_min - margin_x, x_max + margin_x, y_min - margin_y, y_max + margin_y))
+        if window is None:
+            return
+        data, header = window
+        extent = list(dem.header_extent(header))
+
+        # З np.memmap читаються лише рядки фрагмента
+        self.terrain_image.set_data(composite_terrain(data, header, self.terrain_norm, MAP_HILLSHADE))
+        self.terrain_image.set_extent(extent)
+        self.terrain_view = (header['cellsize'], extent)
+        logger.debug("Рельєф: рівень %dx, фрагмент %s", factor, data.shape)
+
+        self.canvas.draw_idle()
+
     def onclick(self, event):
         """
         Натискання колесиком по мапі ставить точку випромінювача
@@ -666,9 +859,9 @@ class MapArea(QWidget):
         """
         # event.button == 1 - ЛКМ, 2 - колесико, 3 - ПКМ
         if event.button == 2 and event.xdata is not None and event.ydata is not None:
-            print('%s click: button=%d, x=%d, y=%d, xdata=%f, ydata=%f' %
-              ('double' if event.dblclick else 'single', event.button,
-               event.x, event.y, event.xdata, event.ydata))
+            logger.debug('%s click: button=%d, x=%d, y=%d, xdata=%f, ydata=%f',
+              'double' if event.dblclick else 'single', event.button,
+               event.x, event.y, event.xdata, event.ydata)
             self.parent.statusbar.showMessage(f"Обрано точку для обчислень: xdata={event.xdata}, ydata={event.ydata}")
 
             # Видаляє попередню точку, якщо вона існує
@@ -684,6 +877,7 @@ class MapArea(QWidget):
             self.last_point = self.ax.plot(event.xdata, event.ydata, 'o', color=color, markersize=5)[0] #точечна точка
 
             self.canvas.draw()
+            self.schedule_live_update()
 
     def get_last_point(self):
         """
@@ -699,100 +893,189 @@ class MapArea(QWidget):
         :param header: Інформація про заголовок файлу рельєфу.
         :param height_data: Дані з рельєфом місцевості.
         """
-        if self.last_point is not None:
-            t_point = [coord for coord in self.last_point.get_xydata()[0]] #координати обраної точки
-            lon_start, lat_start = t_point[0], t_point[1] # self.get_coordinates(t_point[0], t_point[1], header, self.downsample_factor)
-            print(f"Ірл широта, довгота: {lat_start}, {lon_start}")
-
-            print("Думаю, шурупаю...")
-            self.parent.statusbar.showMessage(f"Відбувається обчислення...")
-            
-            # Розрахунок покриття
-            coverage_results = self.calculate_coverage(lon_start, lat_start, height_data, header)
-            
-            print("Покриття знайдено, малюю...")
-            self.parent.statusbar.showMessage(f"Покриття знайдено, відбувається рендер...")
+        # Повторне натискання під час розрахунку скасовує його
+        if self.worker is not None:
+            self.worker.cancel()
+            self.parent.statusbar.showMessage(f"Скасування обчислення...")
+            return
 
-            # Візуалізація покриття
-            self.update_map_with_coverage(coverage_results, lon_start, lat_start)
+        if self.last_point is not None:
+            self.start_worker(header, height_data)
 
-            self.coverage_area = self.calculate_coverage_area(coverage_results, lon_start, lat_start)
-            print(f"Площа покриття: {self.coverage_area} km²")
-            self.parent.statusbar.showMessage(f"Площа покриття: {self.coverage_area} km²")
-            
             ####### Original maths ####### 
             # Видалений сегмент коду, збережений у нотатках, що обчислював 
             # втрати сигналу між двома вказаними точками
 
-    def update_map_with_coverage(self, coverage_results, lon_start, lat_start):
-        """
-        Візуалізація покриття сигналу у вигляді градієнтних ліній, що виходять з обраної точки.
-        
-        :param coverage_results (list of dict): Дані про присутність покриття для кожного азимута,
-            отримані в результаті функції calculate_coverage.
-        :param lon_start, lat_start: Координати центру пучка.
+    def start_worker(self, header, height_data, coarse=False):
         """
+        Запуск фонового розрахунку для обраної точки з параметрами поточної вкладки.
+        Попередній розрахунок, якщо він ще триває, скасовується, а його результати ігноруються.
 
-        # pprint(coverage_results)
+        :param header: Інформація про заголовок файлу рельєфу.
+        :param height_data: Дані з рельєфом місцевості.
+        :param coarse: Грубий швидкий прохід живого перегляду (див. live_settings).
+        """
+        t_point = [coord for coord in self.last_point.get_xydata()[0]] #координати обраної точки
+        lon_start, lat_start = t_point[0], t_point[1] # self.get_coordinates(t_point[0], t_point[1], header, self.downsample_factor)
+        logger.info("Ірл широта, довгота: %s, %s", lat_start, lon_start)
 
-        # Очищує попередній пучок, якщо користувач його не зберіг
-        if self.last_collection and self.last_collection not in self.collections[1]:
-            self.last_collection.remove()
-            self.canvas.draw()
+        logger.info("Думаю, шурупаю...")
+        self.parent.statusbar.showMessage(f"Відбувається обчислення...")
 
-        cmap = plt.cm.Reds  # Вибір колірної схеми
-        cmap2 = plt.cm.Greens
+        # Параметри читаються тут, у потоці інтерфейсу; розрахунок іде у фоновому потоці
+        current_tab_name = self.tabWidget.tabText(self.tabWidget.currentIndex())
+        settings = self.tabManager.get_tab_settings(current_tab_name)["sliders"]
+        if coarse:
+            settings = self.live_settings(settings)
+            if COVERAGE_OUTPUT != "viewshed" and len(self.terrain.tiles) <= 1:
+                # Грубі промені - на рівні піраміди з коміркою, не більшою за крок профілю
+                cells = settings["Динамічний крок"] / (math.radians(header['cellsize']) * viewshed.EARTH_RADIUS)
+                _, height_data, header = self.pyramid.level_for(cells, "mean")
+        if COVERAGE_OUTPUT == "viewshed":
+            # Растр покриття одним проходом кільцями, без променів
+            compute = partial(self.calculate_viewshed, lon_start, lat_start, height_data, header, settings,
+                max_cells=RASTER_MAX_CELLS // LIVE_STEP_FACTOR if coarse else RASTER_MAX_CELLS)
+        else:
+            # Грубий прохід короткий - процеси пулу не запускаються
+            compute = partial(self.calculate_coverage, lon_start, lat_start, height_data, header, settings,
+                workers=1 if coarse else COVERAGE_WORKERS)
+
+        # Застарілий розрахунок зупиняється, його сигнали надалі ігноруються
+        if self.worker is not None:
+            self.worker.cancel()
+
+        self.streamed_rays = None
+        worker = CoverageWorker(compute, self, streaming=COVERAGE_OUTPUT == "rays")
+        worker.progress.connect(partial(self.show_coverage_progress, worker))
+        worker.rays.connect(partial(self.stream_coverage, worker, lon_start, lat_start))
+        worker.computed.connect(partial(self.show_coverage, worker, coarse, lon_start, lat_start))
+        worker.failed.connect(partial(self.coverage_failed, worker))
+        worker.finished.connect(partial(self.worker_finished, worker))
+        self.worker = worker
+        self.pushButton_2.setText("Скасувати")
+        worker.start()
+
+    def live_settings(self, settings):
+        """
+        Параметри грубого проходу живого перегляду: рідші азимути та більший крок профілю.
+        """
+        settings = dict(settings)
+        settings["Крок (°)"] = max(settings["Крок (°)"], LIVE_AZIMUTH_STEP)
+        settings["Динамічний крок"] = settings["Динамічний крок"] * LIVE_STEP_FACTOR
+        return settings
 
-        # Підготовка для пучка LineCollection
-        segments = []  # Список відрізків ліній, координати: [(x1, y1), (x2, y2)]
-        colors = []  # Відповідний колір для кожного відрізка лінії
+    def schedule_live_update(self):
+        """
+        Реакція живого перегляду на зміну параметрів чи точки: грубий прохід після паузи
+        LIVE_DEBOUNCE_MS, повний - якщо змін немає LIVE_REFINE_MS.
+        Кожна нова зміна перезапускає обидва таймери.
+        """
+        if not self.live_checkbox.isChecked() or self.last_point is None:
+            return
+        self.live_timer.start(LIVE_DEBOUNCE_MS)
+        self.refine_timer.start(LIVE_REFINE_MS)
 
-        for coverage_result in coverage_results:
-            lon1, lat1 = lon_start, lat_start
-            i = 0
-            while i < len(coverage_result[0]):
-                lon2, lat2 = coverage_result[0][i], coverage_result[1][i]
-                p_rec_real = coverage_result[2][i]
-                coverage = coverage_result[3][i]
+    def toggle_live_preview(self, enabled):
+        """
+        Увімкнення живого перегляду одразу показує покриття для поточних параметрів.
+        """
+        if enabled:
+            self.schedule_live_update()
+        else:
+            self.live_timer.stop()
+            self.refine_timer.stop()
 
-                if coverage != np.True_:
-                    # Збереження відрізка
-                    segments.append([(lon1, lat1), (lon2, lat2)])
+    def show_coverage_progress(self, worker, done, total):
+        """
+        Відображення прогресу фонового розрахунку в статус барі.
+        """
+        if worker is not self.worker:
+            return
+        self.parent.statusbar.showMessage(f"Відбувається обчислення... {done}/{total}")
 
-                    # Нормалізація всіх значень втрат для узгодженого відображення кольору та прозорості
-                    # normalized_loss = norm(losses_db[i])
+    def show_coverage(self, worker, coarse, lon_start, lat_start, coverage_results):
+        """
+        Відображення результату фонового розрахунку (викликається в потоці інтерфейсу).
 
-                    # Визначення кольору для поточного сегмента
-                    loss_color = abs(p_rec_real) / 100
-                    color = cmap(loss_color)
-                    # Динамічний ступінь прозорості
-                    alpha = np.clip(0.1 + (abs(p_rec_real) / 100) * 0.3, 0.1, 0.4)  # Scale the alpha to [0.1, 0.4]
-                    # alpha = 0.1 + alpha * (0.4)
+        :param worker: CoverageWorker, що надіслав результат (результати застарілих ігноруються).
+        :param coarse: Чи це грубий прохід живого перегляду.
+        :param lon_start, lat_start: Координати передавача.
+        :param coverage_results: Промені calculate_coverage, растр (power, grid) calculate_viewshed
+            або None, якщо розрахунок скасовано.
+        """
+        if worker is not self.worker:
+            return
+        streamed_rays, self.streamed_rays = self.streamed_rays, None
+        if coverage_results is None:
+            # Частковий пучок скасованого розрахунку не залишається на мапі
+            if streamed_rays is not None and self.last_collection not in self.collections[1]:
+                self.last_collection.remove()
+                self.last_collection = None
+                self.canvas.draw_idle()
+            logger.info("Обчислення скасовано")
+            self.parent.statusbar.showMessage(f"Обчислення скасовано")
+            return
+
+        logger.info("Покриття знайдено, малюю...")
+        self.parent.statusbar.showMessage(f"Покриття знайдено, відбувається рендер...")
+
+        # Візуалізація покриття
+        if COVERAGE_OUTPUT == "viewshed":
+            self.coverage_area = self.show_raster(*coverage_results)
+        elif COVERAGE_OUTPUT == "raster":
+            self.coverage_area = self.update_map_with_raster(coverage_results, lon_start, lat_start)
+        else:
+            # Поступовий пучок уже містить усі промені в порядку азимутів - лишається перемалювати
+            if streamed_rays == len(coverage_results):
+                self.canvas.draw()
+            else:
+                self.update_map_with_coverage(coverage_results, lon_start, lat_start)
+            self.coverage_area = self.calculate_coverage_area(coverage_results, lon_start, lat_start)
+        prefix = "Попередній перегляд. " if coarse else ""
+        logger.info("%sПлоща покриття: %s km²", prefix, self.coverage_area)
+        self.parent.statusbar.showMessage(f"{prefix}Площа покриття: {self.coverage_area} km²")
 
-                    colors.append((1, 0, 0, alpha))
-                else:
-                    segments.append([(lon1, lat1), (lon2, lat2)])
+    def coverage_failed(self, worker, message):
+        """
+        Повідомлення про помилку фонового розрахунку.
+        """
+        if worker is not self.worker:
+            return
+        logger.error("Помилка обчислення: %s", message)
+        self.parent.statusbar.showMessage(f"Помилка обчислення: {message}")
 
-                    # Нормалізація всіх значень втрат для узгодженого відображення кольору та прозорості
-                    # normalized_loss = norm(losses_db[i])
+    def worker_finished(self, worker):
+        """
+        Звільнення завершеного потоку; після останнього - повернення кнопки до початкового стану.
+        """
+        worker.deleteLater()
+        if worker is self.worker:
+            self.worker = None
+            self.pushButton_2.setText("Обчислити")
 
-                    # Визначення кольору для поточного сегмента
-                    loss_color = np.clip(0.25 + (abs(p_rec_real) / 100) * 0.3, 0.1, 0.4)
-                    color = cmap2(loss_color)
-                    # Динамічний ступінь прозорості
-                    # alpha = np.clip(loss_color, 0, 1) 
-                    alpha = 0.1
+    def stop_worker(self):
+        """
+        Скасування фонових розрахунків та очікування їх завершення (перед закриттям мапи).
+        """
+        self.live_timer.stop()
+        self.refine_timer.stop()
+        for worker in self.findChildren(CoverageWorker):
+            worker.cancel()
+            worker.wait()
 
-                    colors.append((0, 1, 1, loss_color))
+    def update_map_with_coverage(self, coverage_results, lon_start, lat_start):
+        """
+        Візуалізація покриття сигналу у вигляді градієнтних ліній, що виходять з обраної точки.
+        
+        :param coverage_results (list of dict): Дані про присутність покриття для кожного азимута,
+            отримані в результаті функції calculate_coverage.
+        :param lon_start, lat_start: Координати центру пучка.
+        """
 
-                # Оновлення початкової точки для наступного відрізка
-                lon1, lat1 = lon2, lat2
-                i += 1
+        # pprint(coverage_results)
 
-        # Пучор відрізків
-        line_collection = LineCollection(segments, colors=colors, linewidths=1)
-        collection = self.ax.add_collection(line_collection)
-        self.last_collection = collection
+        self.start_coverage_collection()
+        self.append_coverage_rays(coverage_results, lon_start, lat_start)
 
         # Add a colorbar using a ScalarMappable object
         # sm = ScalarMappable(cmap=cmap, norm=norm)
@@ -804,324 +1087,191 @@ class MapArea(QWidget):
         # Промальовка
         self.canvas.draw()
 
-    def calculate_coverage(self, lon_start, lat_start, height_data, header):
+    def start_coverage_collection(self):
         """
-        Розрахунок зони покриття передавача. Для математичних розрахунків використовуються 
-        параметри, що обираються користувачем та підгружаються з інтерфейсу напряму.
-
-        :param lon_start, lat_start: Розташування передавача.
-        :param height_data: масив даних з рельєфом місцевості.
-        :param header: Інформація про заголовок файлу рельєфу.
-
-        :return: Дані про втрату сигналу та присутність покриття для кожного азимута.
-            Приклад структури: 
-                [
-                    [lons], [lats], [losses_db], [coverages (bool)]},
-                    [lons], [lats], [losses_db], [coverages (bool)]},
-                    ...
-                ]
+        Порожній пучок LineCollection, до якого додаються відрізки променів.
         """
-        # Динамічне отримання назви поточної вкладки
-        current_tab_index = self.tabWidget.currentIndex()
-        current_tab_name = self.tabWidget.tabText(current_tab_index)
-
-        # Параметри
-        settings = self.tabManager.get_tab_settings(current_tab_name)["sliders"]
-        step_azimuth = int(settings["Крок (°)"])            # Крок обчислень в межах сегмента (у градусах)
-        range_start = int(settings["Азимут (°)"])           # Початковий азимут сегмента (у градусах)
-        range_end = range_start + int(settings["Кут (°)"])  # Автоматично визначений крайній кут сегмента
-        
-        # Змінна результатів
-        azimuths = list(range(range_start, range_end, step_azimuth))
-        coverage_grid = []
-
-        ### Паралельний розрахунок для кожного азимута ###
-        # Використання ThreadPoolExecutor або ProcessPoolExecutor для паралельного обчислення
-        # with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-        #     futures = {
-        #         executor.submit(
-        #             self.maths_for_line, lon_start, lat_start, height_data, header, azimuth, settings
-        #         ) for azimuth in azimuths
-        #     }
-            
-        #     for future in futures:
-        #         result = future.result()
-        #         if result:  # Пропуск None
-        #             # print(result)
-        #             coverage_grid.append(result)
-        #             # coverage_grid.append({"azimuth": azimuth, "distances": distances, "losses_db": losses_output})
-
-        # print(coverage_grid)
+        # Очищує попередній пучок, якщо користувач його не зберіг
+        if self.last_collection and self.last_collection not in self.collections[1]:
+            self.last_collection.remove()
 
-        ### Послідовний розрахунок для кожного азимута ###
-        for azimuth in azimuths:
-            result = self.maths_for_line(lon_start, lat_start, height_data, header, azimuth, settings)
-            if result:  # Пропуск None
-                coverage_grid.append(result)
+        self.stream_segments = [] # Відрізки пучка, координати: [(x1, y1), (x2, y2)]
+        self.stream_colors = []   # Відповідний колір для кожного відрізка лінії
+        self.streamed_rays = 0    # Кількість променів у пучку
+        self.last_collection = self.ax.add_collection(LineCollection([], linewidths=1))
 
-        return coverage_grid
+    def append_coverage_rays(self, coverage_results, lon_start, lat_start):
+        """
+        Додавання відрізків променів до поточного пучка (без перемальовки).
 
-    def maths_for_line(self, lon_start, lat_start, height_data, header, azimuth, settings):
-        """Математика втрат на відрізку"""
-
-        # Параметри
-        freq_mhz = settings["Частота (GHz)"]            # Частота в ГГц
-        lambda_wave = 3e8 / (freq_mhz * 1e6)            # Довжина хвилі в метрах
-        tx_height = settings["Висота передавача (m)"]   # Висота передавача (у метрах)
-        rx_height = settings["Висота приймача (m)"]     # Висота приймача (у метрах)
-        q_percent = settings["Ймовірність (%)"]         # Відсоток імовірності ціле число від 1 до 99
-        wa = 4000                                       # Роздільна здатність у метрах/Підібрано, щоб sigma_L = 5,5 дБ
-        max_distance_m = settings["Радіус (m)"]         # Радіус кола/сегмента (у метрах)
-        step_azimuth = int(settings["Крок (°)"])        # Крок обчислень в межах сегмента (у градусах)
-        range_start = int(settings["Азимут (°)"])       # Початковий азимут сегмента (у градусах)
-        range_end = range_start + int(settings["Кут (°)"]) # Автоматично визначений крайній кут сегмента
-        points_step = settings["Динамічний крок"]       # Число, що регулює кількість сегментів обчислень 
-                                                        # (більше число <=> більша оптимізація <=> менша точність)
-        P_trm = settings["Потужність передавача (W)"]                       # Потужність передавача (Вт)
-        G_trm = settings["Коеф. підсилення антени (dBi)"]              # Посилення антени передавача (дБi)
-        L_dp = settings["Втрати в дуплексному фільтрі"]                     # Втрати в дуплексному фільтри
-        L_f_trm = settings["Втрати в фідері передавального тракту (dB)"]    # Втрати в фідері передавального тракту (дБ)
-        L_dop_trm = settings["Додаткові втрати в передавальному тракті"]    # Додаткові втрати в передавальному тракті (дБ)
-        G_rec = settings["Коеф. підсилення приймальної антени (dBi)"]  # Коефіцієнт підсилення приймальної антени (дБi)
-        L_f_rec = settings["Втрати в фідері приймального тракту (dB)"]      # Втрати фідера приймача (дБ)
-        L_dop_rec = settings["Додаткові втрати в приймальному тракті"]      # Втрати через доплер приймача (дБ)
-        P_rec = settings["Чутливість приймача (dbW)"]                       # Порогове значення добиття (дБВт)
-
-        # Кінець відрізка для кожного обчислювального азимута
-        endpoint = self.coordinates_away_from_centre_with_radius_and_azimuth(lat_start, lon_start, max_distance_m, azimuth)
-        
-        lat_end = endpoint[0]
-        lon_end = endpoint[1]
-
-        # print(f"Кінцева широта, довгота: {lat_end}, {lon_end}")
-
-        # Перевірка та коригування координат відповідно до меж карти
-        cellsize_adjusted = header['cellsize'] * self.downsample_factor
-        x_min = header['xllcorner']
-        x_max = header['xllcorner'] + header['cellsize'] * self.data.shape[1]
-        y_min = header['yllcorner']
-        y_max = header['yllcorner'] + header['cellsize'] * self.data.shape[0]
-
-        if not (x_min <= lon_end <= x_max and y_min <= lat_end <= y_max):
-            # Коригування кінцевої точки на межі карти
-            # print("We're out!")
-            lon_end, lat_end = self.adjust_to_map_boundary(lat_start, lon_start, lon_end, lat_end, )
-            print(f"Змінено! Кінцева широта, довгота: {lat_end}, {lon_end}")
-
-        # Отримання висоти місцевості в початковій та кінцевій точках
-        startpoint_height = maths.get_height_for_coordinates(lon_start, lat_start, height_data, header)
-        print(startpoint_height)
-        endpoint_height = maths.get_height_for_coordinates(lon_end, lat_end, height_data, header)
-
-        # Висота антен над рельєфом
-        tx_height = tx_height + startpoint_height
-        rx_height = rx_height + endpoint_height
-
-        # Розрахунок реальної відстані між двома точками за допомогою формули Хаверсінуса
-        d_total = maths.haversine_distance(lon_start, lat_start, lon_end, lat_end)
-
-        # Кількість точок уздовж маршруту (дистанція буде автоматично змінюватися залежно від довжини маршруту)
-        num_points = int(d_total/points_step)
-
-        # Генерація точок за маршрутом
-        distances = np.linspace(0, d_total, num_points)
-        lons = np.linspace(lon_start, lon_end, num_points)
-        lats = np.linspace(lat_start, lat_end, num_points)
-
-        terrain_heights = np.array([
-            maths.get_height_for_coordinates(lon, lat, height_data, header) for lon, lat in zip(lons, lats)
-        ])
-
-        # Згладжування профілю рельєфу
-        spl = make_interp_spline(distances, terrain_heights, k=3)
-        smooth_distances = np.linspace(distances.min(), distances.max(), num_points)
-        smooth_terrain_heights = spl(smooth_distances)
-
-        # Генерація точок для більш гладкого графіка
-        smooth_graph_points = num_points * 10  # Збільшуємо кількість точок тільки для графіка
-        smooth_graph_distances = np.linspace(distances.min(), distances.max(), smooth_graph_points)
-        smooth_graph_terrain_heights = spl(smooth_graph_distances)
-
-        # Обчислення лінії LOS з урахуванням висот антен
-        smooth_los_heights = maths.calculate_los_with_antenna(
-            smooth_graph_distances,
-            smooth_graph_terrain_heights,
-            tx_height,  
-            rx_height
-        )
+        Покриття - блакитний колір, без покриття - червоний; прозорість залежить від P_rec.
 
-        # Розрахунок сумарних втрат
-        total_losses_linear, total_losses_db = maths.calculate_total_losses(smooth_distances, 
-            smooth_terrain_heights, smooth_los_heights, d_total, lambda_wave)
+        :param coverage_results: Промені у форматі calculate_coverage.
+        :param lon_start, lat_start: Координати центру пучка.
+        """
+        for lons, lats, p_rec_real, coverage in coverage_results:
+            # Відрізок i з'єднує точку i-1 (або центр пучка) з точкою i
+            xs = np.concatenate(([lon_start], lons))
+            ys = np.concatenate(([lat_start], lats))
+            points = np.column_stack((xs, ys))
+            self.stream_segments.append(np.stack((points[:-1], points[1:]), axis=1))
+
+            strength = np.abs(np.asarray(p_rec_real, dtype=float)) / 100
+            covered = np.asarray(coverage, dtype=bool)
+            colors = np.zeros((covered.size, 4))
+            colors[covered] = (0, 1, 1, 0)
+            colors[covered, 3] = np.clip(0.25 + strength[covered] * 0.3, 0.1, 0.4)
+            colors[~covered] = (1, 0, 0, 0)
+            colors[~covered, 3] = np.clip(0.1 + strength[~covered] * 0.3, 0.1, 0.4)
+            self.stream_colors.append(colors)
+
+        self.streamed_rays += len(coverage_results)
+        if self.stream_segments:
+            self.last_collection.set_segments(np.concatenate(self.stream_segments))
+            self.last_collection.set_color(np.concatenate(self.stream_colors))
+
+    def stream_coverage(self, worker, lon_start, lat_start, coverage_results):
+        """
+        Поступовий рендер: пакет щойно обчислених променів додається до пучка,
+        перемальовка відкладається до простою циклу подій (draw_idle).
 
-        # Виведення сумарних втрат
-        # print(f"\nЗагальні втрати дифракції (лінійні): {total_losses_linear:.2f}")
-        # print(f"Загальні втрати дифракції (дБ): {total_losses_db:.2f}")
+        :param worker: CoverageWorker, що надіслав пакет (пакети застарілих ігноруються).
+        :param lon_start, lat_start: Координати центру пучка.
+        :param coverage_results: Пакет променів від CoverageWorker.
+        """
+        if worker is not self.worker:
+            return
+        if self.streamed_rays is None:
+            self.start_coverage_collection()
+        self.append_coverage_rays(coverage_results, lon_start, lat_start)
+        self.canvas.draw_idle()
+
+    def update_map_with_raster(self, coverage_results, lon_start, lat_start):
+        """
+        Візуалізація покриття одним растром (imshow), вирівняним із сіткою мапи.
 
-        distance_km = d_total  # Відстань у км
-        total_loss_lr = maths.longley_rice_fixed_with_propob_loc(freq_mhz, distance_km, q_percent, wa, lambda_wave)
-        total_loss = total_loss_lr + total_losses_db
-        # print(f"Final Total Loss (Longley-Rice, propob_loc, Difr): {total_loss:.2f} dB")
+        :param coverage_results: Промені, отримані в результаті функції calculate_coverage.
+        :param lon_start, lat_start: Координати передавача.
 
-        # Виведення таблиці з результатами
-        print("\nТочка    Відстань (м)    Висота рельєфу (м)  Висота LOS (м)  Радіус Френеля (м)      Втрати (м)      Втрати (дБ)")
+        :return: Площа комірок з покриттям (км²).
+        """
+        power, grid = engine.coverage_raster(coverage_results, lon_start, lat_start, self.header,
+            max_cells=RASTER_MAX_CELLS)
+        return self.show_raster(power, grid)
 
-        losses_output = []
+    def show_raster(self, power, grid):
+        """
+        Відображення растра P_rec поверх мапи.
 
-        for i in range(0, len(smooth_distances), 2):  # Виводимо для всіх точок
-            losses_at_i = \
-            maths.calculate_integrated_losses(smooth_distances, smooth_terrain_heights, smooth_los_heights, d_total, lambda_wave)[i]
-            losses_db_at_i = 10 * math.log10(losses_at_i) if losses_at_i > 1 else 0
-            fresnel_r_at_i = maths.fresnel_radius(smooth_distances[i], d_total, lambda_wave)
-            losses_output.append(losses_db_at_i)
+        :param power: Растр рівня сигналу (NaN - немає даних).
+        :param grid: Заголовок растра у форматі .asc.
 
-            print(
-                f"{i + 1:<10}{smooth_distances[i]:<20.2f}{smooth_terrain_heights[i]:<20.2f}{smooth_los_heights[i]:<20.2f}"
-                f"{fresnel_r_at_i:<20.2f}{losses_at_i:<20.2f}{losses_db_at_i:<20.2f}"
-            )
+        :return: Площа комірок з покриттям (км²).
+        """
+        # Очищує попередній рендер, якщо користувач його не зберіг
+        if self.last_collection and self.last_collection not in self.collections[1]:
+            self.last_collection.remove()
 
-        # Можливість побудови графіка для останнього відрізка 
-        # maths.plot_updated_smooth_terrain(
-        #     smooth_distances,
-        #     smooth_terrain_heights,
-        #     smooth_los_heights,
-        #     smooth_graph_distances,
-        #     smooth_graph_terrain_heights,
-        #     smooth_los_heights
-        # )
+        current_tab_name = self.tabWidget.tabText(self.tabWidget.currentIndex())
+        threshold = self.tabManager.get_tab_settings(current_tab_name)["sliders"]["Чутливість приймача (dbW)"]
+        self.last_raster = (power, grid) # Для експорту через dem.write_asc
+
+        # Ті самі кольори, що й у відрізків: покриття - блакитний, без покриття - червоний
+        rgba = np.zeros(power.shape + (4,), dtype=np.float32)
+        known = ~np.isnan(power)
+        covered = known & (np.nan_to_num(power, nan=-np.inf) >= threshold)
+        strength = np.abs(np.nan_to_num(power)) / 100
+        rgba[covered] = (0, 1, 1, 0)
+        rgba[covered, 3] = np.clip(0.25 + strength[covered] * 0.3, 0.1, 0.4)
+        rgba[known & ~covered] = (1, 0, 0, 0)
+        rgba[known & ~covered, 3] = np.clip(0.1 + strength[known & ~covered] * 0.3, 0.1, 0.4)
+
+        x_min, x_max, y_min, y_max = dem.header_extent(grid)
+        limits = (self.ax.get_xlim(), self.ax.get_ylim())
+        self.last_collection = self.ax.imshow(rgba, origin="upper", extent=[x_min, x_max, y_min, y_max],
+            interpolation="nearest", zorder=2)
+        self.ax.set_xlim(*limits[0]) # imshow не повинен змінювати масштаб мапи
+        self.ax.set_ylim(*limits[1])
 
+        self.canvas.draw()
+        return engine.raster_coverage_area(power, grid, threshold)
 
+    def calculate_viewshed(self, lon_start, lat_start, height_data, header, settings, max_cells=None,
+            progress=None, cancelled=None):
+        """
+        Растр покриття методом радіальної розгортки (viewshed.coverage_viewshed).
 
-        P_rec_real = (10 * np.log10(P_trm) + G_trm + G_rec - L_dp - L_f_trm - L_dop_trm -
-                  L_f_rec - L_dop_rec - total_loss)
-        coverage_map = P_rec_real >= P_rec
-        # print(f"P_rec_real: {P_rec_real}, покриття: {coverage_map}")
+        :param lon_start, lat_start: Розташування передавача.
+        :param height_data: масив даних з рельєфом місцевості.
+        :param header: Інформація про заголовок файлу рельєфу.
+        :param settings: Параметри вкладки {назва: значення}.
+        :param max_cells: Максимальний розмір растра по стороні (за змовчуванням RASTER_MAX_CELLS).
+        :param progress, cancelled: Прогрес і скасування (див. CoverageWorker).
 
-        # Розрахунок рівня сигналу на кожній точці
-        P_rec_real_points = []
+        :return: (power, grid) - растр P_rec та його заголовок, або None, якщо скасовано.
+        """
+        # Якщо в теці кілька мап, розгортка продовжується сусідніми плитками
+        overviews = self.pyramid
+        if len(self.terrain.tiles) > 1:
+            height_data, overviews = self.terrain, None
+        return viewshed.coverage_viewshed(lon_start, lat_start, height_data, header, settings,
+            max_cells=max_cells or RASTER_MAX_CELLS, overviews=overviews, progress=progress, cancelled=cancelled)
+
+    def calculate_coverage(self, lon_start, lat_start, height_data, header, settings, workers=None,
+            progress=None, cancelled=None, stream=None):
+        """
+        Розрахунок зони покриття передавача. Для математичних розрахунків використовуються 
+        параметри, що обираються користувачем (читаються з інтерфейсу в do_signal).
 
-        for i in range(1, num_points):
-            # Відстань до поточної точки
-            d_current = distances[i]
-            
-            # Загальні втрати на поточній точці
-            losses_current = maths.calculate_integrated_losses(
-                smooth_distances[:i+1], smooth_terrain_heights[:i+1], smooth_los_heights[:i+1], 
-                d_total, lambda_wave
-            )
-            total_loss_lr = maths.longley_rice_fixed_with_propob_loc(freq_mhz, d_current, q_percent, wa, lambda_wave)
-            total_loss_linear = sum(losses_current)
-            total_loss_db = 10 * math.log10(total_loss_linear) if total_loss_linear > 1 else 0
-            total_loss_at_i = total_loss_lr + total_loss_db
-            
-            # Розрахунок поточного рівня сигналу
-            P_rec_real_current = (
-                10 * np.log10(P_trm) + G_trm + G_rec 
-                - L_dp - L_f_trm - L_dop_trm
-                - L_f_rec - L_dop_rec 
-                - total_loss_at_i
-            )
-            
-            # Збереження рівня сигналу для поточної точки
-            P_rec_real_points.append(P_rec_real_current)
+        :param lon_start, lat_start: Розташування передавача.
+        :param height_data: масив даних з рельєфом місцевості.
+        :param header: Інформація про заголовок файлу рельєфу.
+        :param settings: Параметри вкладки {назва: значення}.
+        :param workers: Кількість процесів (за змовчуванням COVERAGE_WORKERS).
+        :param progress, cancelled: Прогрес і скасування (див. CoverageWorker).
+        :param stream: Отримувач готових променів для поступового рендеру.
 
-        # Перевірка покриття на кожній точці
-        coverage_map_points = [P >= P_rec for P in P_rec_real_points]
+        :return: Дані про втрату сигналу та присутність покриття для кожного азимута.
+            Приклад структури: 
+                [
+                    [lons], [lats], [losses_db], [coverages (bool)]},
+                    [lons], [lats], [losses_db], [coverages (bool)]},
+                    ...
+                ]
+            або None, якщо розрахунок скасовано.
+        """
+        # Якщо в теці кілька мап, промені продовжуються сусідніми плитками
+        clip_extent = self.clip_extent()
+        if len(self.terrain.tiles) > 1:
+            height_data, clip_extent = self.terrain, None
 
-        # Виведення результатів
-        ray = [lons[1::], lats[1::], P_rec_real_points, coverage_map_points]
-        # for i, (lon, lat, P, coverage) in enumerate(zip(lons, lats, P_rec_real_points, coverage_map_points)):
-        #     print(f"Точка {i + 1}: довгота {lon:.6f}, широта {lat:.6f}, P_rec_real = {P:.2f} дБм, покриття: {'Так' if coverage else 'Ні'}")
+        # Розрахунок для кожного азимута (паралельно, якщо COVERAGE_WORKERS > 1)
+        return engine.calculate_coverage(lon_start, lat_start, height_data, header, settings,
+            workers=COVERAGE_WORKERS if workers is None else workers, clip_extent=clip_extent,
+            progress=progress, cancelled=cancelled, stream=stream)
 
-        # print(f"ray: {ray}")
+    def clip_extent(self):
+        """
+        Межі мапи, до яких обрізаються промені: ті самі, що й для перевірки висот (повна роздільна здатність).
+        """
+        return dem.header_extent(self.header)
 
-        return ray 
-        """{
-                "azimuth": azimuth,
-                "distances": distances,
-                "losses_db": total_loss,
-            }"""
+    def maths_for_line(self, lon_start, lat_start, height_data, header, azimuth, settings):
+        """Математика втрат на відрізку (див. engine.maths_for_line)"""
+        return engine.maths_for_line(lon_start, lat_start, height_data, header, azimuth, settings,
+            self.clip_extent())
 
     def adjust_to_map_boundary(self, lat_start, lon_start, lon_end, lat_end):
         """
         Коригування точки кінцевого маршруту на межі карти, враховуючи зчитані параметри.
         """
-        # Розрахунок меж карти з урахуванням зменшення роздільної здатності
-        cellsize_adjusted = self.header['cellsize'] * self.downsample_factor
-        x_min = self.header['xllcorner']
-        x_max = self.header['xllcorner'] + cellsize_adjusted * self.data_downsampled.shape[1]
-        y_min = self.header['yllcorner']
-        y_max = self.header['yllcorner'] + cellsize_adjusted * self.data_downsampled.shape[0]
-
-        # Створення лінії між стартовою та кінцевою точками
-        line = LineString([(lon_start, lat_start), (lon_end, lat_end)])
-
-        # Визначення меж карти
-        map_boundary = box(x_min, y_min, x_max, y_max)
-
-        # Перевірка перетину
-        if not line.intersects(map_boundary):
-            return lon_start, lat_start  # Якщо немає перетину, повертаємо стартову точку
-
-        intersection = line.intersection(map_boundary)
-
-        if intersection.is_empty:
-            return lon_start, lat_start
-
-        # Обробка типів геометрій
-        if intersection.geom_type == "Point":
-            return intersection.x, intersection.y
-        elif intersection.geom_type == "MultiPoint":
-            last_point = list(intersection)[-1]
-            return last_point.x, last_point.y
-        elif intersection.geom_type == "LineString":
-            last_point = list(intersection.coords)[-1]
-            return last_point[0], last_point[1]
-        elif intersection.geom_type == "GeometryCollection":
-            points = [geom for geom in intersection.geoms if geom.geom_type == "Point"]
-            if points:
-                last_point = points[-1]
-                return last_point.x, last_point.y
-
-            lines = [geom for geom in intersection.geoms if geom.geom_type == "LineString"]
-            if lines:
-                last_point = list(lines[-1].coords)[-1]
-                return last_point[0], last_point[1]
-
-        raise ValueError(f"Unexpected geometry type for intersection: {intersection.geom_type}")
+        return engine.adjust_to_map_boundary(lat_start, lon_start, lon_end, lat_end, self.clip_extent())
 
     def coordinates_away_from_centre_with_radius_and_azimuth(self, lat, lon, radius, azimuth, radians=False):
         """
-        Пошук координат на певній відстані та під певним кутом від точки з заданими широтою та довготою.
-
-        :param lat, lon: Координати початку обчислень.
-        :param radius: Обрана відстань від точки початку.
-        :param azimuth: Кутове значення відхилення в градусах або радіанах.
-        :param radians (bool): Якщо True, azimuth інтерпретується в радіанах. Інакше - в градусах.
-       
-        :return: Пара (широта, довгота), що представляє обчислені координати.
+        Пошук координат на певній відстані та під певним кутом від точки (див. engine).
         """
-        R = 6378100  # Радіус Землі в метрах
-
-        if not radians:
-            azimuth = math.radians(azimuth)  # Перетворення азимуту у радіани, якщо він заданий у градусах
-
-        lat_rad = math.radians(lat)  # Convert latitude to radians once
-        lon_rad = math.radians(lon)  # Convert longitude to radians once
-
-        # Apply the formulas for latitude and longitude difference
-        dlat = math.asin(math.sin(lat_rad) * math.cos(radius / R) +
-                         math.cos(lat_rad) * math.sin(radius / R) * math.cos(azimuth))
-
-        dlon = lon_rad + math.atan2(
-            math.sin(azimuth) * math.sin(radius / R) * math.cos(lat_rad),
-            math.cos(radius / R) - math.sin(lat_rad) * math.sin(dlat)
-        )
-
-        # Конвертація назад у градуси
-        point = [math.degrees(dlat), math.degrees(dlon)]
-
-        return point
+        return engine.coordinates_away_from_centre_with_radius_and_azimuth(lat, lon, radius, azimuth, radians)
 
     def calculate_coverage_area(self, coverage_results, lon_start, lat_start):
         """
@@ -1133,56 +1283,7 @@ class MapArea(QWidget):
 
         :return: Загальна площа покриття в км^2.
         """
-        vertices = []
-        vertices.append([lat_start, lon_start])
-
-        for result in coverage_results:
-            i = 0
-            for coverage in result[3]:
-                if not coverage:
-                    break
-                i += 1
-
-            if i == len(result[3]):
-                i -= 1
-
-            point = [result[1][i], result[0][i]]
-            vertices.append(point)
-
-        # Сортування вершин за годинниковою стрілкою
-        center = vertices[0]
-
-        def angle_from_north(point):
-            dx = point[1] - center[1]
-            dy = point[0] - center[0]
-            angle = np.arctan2(dx, dy)  # Кут в радіанах
-            return (2 * np.pi + angle) % (2 * np.pi)  # Нормалізація до [0, 2π]
-
-        # Сортування вершин (крім центру) за кутом з півночі
-        sorted_vertices = [center] + sorted(vertices[1:], key=angle_from_north) + [center]
-
-        # Заміна вершин відсортованими
-        vertices = sorted_vertices
-
-        # polygon = Polygon(vertices)
-        # print(polygon)
-        geod = Geod(ellps="WGS84")
-        lons, lats = zip(*vertices)
-        polygon = Polygon(zip(lats, lons))
-        
-        # Debug: Побудова багатокутника
-        # plt.figure(figsize=(8, 6))
-        # plt.plot(lats, lons, marker='o', label='Polygon Vertices')
-        # plt.title("Debug: Polygon")
-        # plt.xlabel("Longitude")
-        # plt.ylabel("Latitude")
-        # plt.legend()
-        # plt.grid(True)
-        # plt.show()
-
-        area, perimeter = geod.geometry_area_perimeter(orient(polygon))
-
-        return area / 1e6 # у км^2
+        return engine.coverage_area(coverage_results, lon_start, lat_start)
 
 class TabManager(Ui_MainWindow):
     """
@@ -1262,6 +1363,9 @@ class TabManager(Ui_MainWindow):
                 field.setText(f"{value / sf:.{len(str(step).split('.')[1])}f}" if isinstance(step, float) else f"{int(value / sf)}") # рівень точності числа в полі
             )
 
+            # Живий перегляд перераховує покриття після зміни параметра
+            slider.valueChanged.connect(lambda _: self.slider_changed())
+
             # Підключити сигнал зміни тексту для оновлення слайдера
             input_field.textChanged.connect(
                 lambda _, slider=slider, field=input_field, sf=scale_factor: 
@@ -1310,6 +1414,13 @@ class TabManager(Ui_MainWindow):
         # Збереження вкладки
         self.tab_widget.addTab(tab, tab_name)
 
+    def slider_changed(self):
+        """
+        Повідомлення мапи про зміну параметра (наведення та живий перегляд).
+        """
+        if self.parent.map_area:
+            self.parent.map_area.settings_changed()
+
     def get_tab_settings(self, tab_name):
         """
         Отримує параметри певної вкладки.
@@ -1346,10 +1457,10 @@ class TabManager(Ui_MainWindow):
         :param tab_name: Назва вкладки, налаштування котрої збережено.
         """
         if self.parent.map_area and self.parent.map_area.last_point:
-            print(f"Last clicked position: {self.parent.map_area.last_point.get_xydata()}")
+            logger.debug("Last clicked position: %s", self.parent.map_area.last_point.get_xydata())
             self.parent.save_location_data(tab_name)
         else:
-            print("No point selected yet.")
+            logger.warning("No point selected yet.")
 
     def update_slider_from_input(self, slider, field, scale_factor):
         """
@@ -1369,10 +1480,14 @@ class TabManager(Ui_MainWindow):
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Для пулу процесів у зібраному .exe
+    logging.basicConfig(level=LOG_LEVEL, format="%(levelname)s %(name)s: %(message)s")
     matplotlib.use("qtagg")
     app = QApplication(sys.argv)
     MainWindow = QMainWindow()
     ui = Ui_MainWindow()
     ui.setupUi(MainWindow)
     MainWindow.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    engine.shutdown_pool()
+    sys.exit(exit_code)
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 import numpy as np
 import math
-import matplotlib.pyplot as plt
-from scipy.interpolate import make_interp_spline
+from pyproj import Geod
+
+import dem # Читання мап та їх бінарний кеш
+
+WGS84 = Geod(ellps="WGS84") # Еліпсоїд для геодезичних ліній
+SPHERE_RADIUS = 6378100 # Радіус сферичної моделі геодезичних ліній (м)
 
 # Функція для обчислення відстані між двома точками за формулою гаверсинуса
 def haversine_distance(lon1, lat1, lon2, lat2):
@@ -16,23 +20,22 @@ def haversine_distance(lon1, lat1, lon2, lat2):
     distance = R * c # Відстань у метрах
     return distance
 
+# Векторизований аналог haversine_distance: відстані від однієї точки до масиву точок
+def haversine_distances(lon1, lat1, lons2, lats2):
+    R = 6371400 # Радіус Землі в метрах
+    phi1 = math.radians(lat1)
+    phi2 = np.radians(np.asarray(lats2, dtype=float))
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(np.asarray(lons2, dtype=float) - lon1)
+    a = np.sin(delta_phi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)) # Відстані у метрах
+
 # Функція для читання даних висот із файлу SRTM
 def load_asc(file_path):
     """
     Завантаження .asc файлу у numpy-масив.
     """
-    header = {}
-    with open(file_path, 'r') as file:
-        for _ in range(6):
-            line = file.readline()
-            key, value = line.split()
-            header[key] = float(value) if '.' in value else int(value)
-
-        data = np.loadtxt(file, dtype=float)
-
-    # Конвертуємо дані у Dask масив для ефективності
-    # data = da.from_array(data, chunks=(1000, 1000))
-    return data, header
+    return dem.load_asc(file_path)
 
 # Функція для отримання висоти за географічними координатами
 def get_height_for_coordinates(lon, lat, height_data, header):
@@ -49,6 +52,104 @@ def get_height_for_coordinates(lon, lat, height_data, header):
     else:
         return None
 
+# Векторизований варіант get_height_for_coordinates для масивів координат
+def get_heights_for_coordinates(lons, lats, height_data, header, method="nearest"):
+    """
+    Отримання висот для масивів координат одним індексуванням numpy.
+
+    :param lons, lats: Масиви довгот і широт однакової форми.
+    :param height_data: Мапа рельєфу.
+    :param header: Інформація про заголовок файлу рельєфу.
+    :param method: Інтерполяція: "nearest", "bilinear" або "bicubic" (див. dem.sample_grid).
+
+    :return: (heights, valid) - висоти (float, NaN поза мапою та без даних) та маска точок з даними.
+    """
+    return dem.sample_grid(height_data, header, lons, lats, method)
+
+# Точки вздовж геодезичних ліній для всіх азимутів і відстаней одним викликом
+def geodesic_points(lon, lat, azimuths, distances, model="wgs84"):
+    """
+    Координати точок на відстанях distances від (lon, lat) вздовж геодезичних ліній з азимутами azimuths.
+
+    :param lon, lat: Координати початку.
+    :param azimuths: Масив азимутів у градусах (n_azimuths,).
+    :param distances: Масив відстаней у метрах (n_distances,).
+    :param model: "wgs84" - геодезичні лінії еліпсоїда (pyproj.Geod),
+        "sphere" - великі кола сфери радіуса SPHERE_RADIUS.
+
+    :return: (lons, lats) - масиви форми (n_azimuths, n_distances).
+    """
+    azimuths, distances = np.broadcast_arrays(np.asarray(azimuths, dtype=float)[:, None],
+        np.asarray(distances, dtype=float)[None, :])
+    return geodesic_fwd(lon, lat, azimuths, distances, model)
+
+# Точки вздовж геодезичних ліній для пар (азимут, відстань) однакової форми
+def geodesic_fwd(lon, lat, azimuths, distances, model="wgs84"):
+    """
+    Те саме, що geodesic_points, але кожна точка має власний азимут: масиви azimuths і distances
+    однакової форми (наприклад, точки променів різної довжини, складені в один масив).
+
+    :return: (lons, lats) - масиви форми azimuths.shape.
+    """
+    azimuths = np.asarray(azimuths, dtype=float)
+    distances = np.asarray(distances, dtype=float)
+    if model == "wgs84":
+        lons, lats, _ = WGS84.fwd(np.full(azimuths.shape, float(lon)), np.full(azimuths.shape, float(lat)),
+            azimuths, distances)
+        return lons, lats
+    if model != "sphere":
+        raise ValueError(f"Unknown geodesic model: {model}")
+
+    azimuths = np.radians(azimuths)
+    angular = distances / SPHERE_RADIUS
+    lat_rad = math.radians(lat)
+    lats = np.arcsin(math.sin(lat_rad) * np.cos(angular) + math.cos(lat_rad) * np.sin(angular) * np.cos(azimuths))
+    lons = math.radians(lon) + np.arctan2(np.sin(azimuths) * np.sin(angular) * math.cos(lat_rad),
+        np.cos(angular) - math.sin(lat_rad) * np.sin(lats))
+    return (np.degrees(lons) + 180) % 360 - 180, np.degrees(lats)
+
+# Довжини геодезичних ліній від однієї точки до масиву точок
+def geodesic_distances(lon, lat, lons, lats, model="wgs84"):
+    """
+    Відстані (м) від (lon, lat) до точок (lons, lats) у тій самій моделі, що й geodesic_points.
+    """
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    if model == "wgs84":
+        _, _, distances = WGS84.inv(np.full(lons.shape, float(lon)), np.full(lats.shape, float(lat)), lons, lats)
+        return distances
+    if model != "sphere":
+        raise ValueError(f"Unknown geodesic model: {model}")
+    return haversine_distances(lon, lat, lons, lats) * SPHERE_RADIUS / 6371400
+
+# Обрізка відрізків прямокутником (Liang-Barsky) для масиву кінцевих точок
+def clip_segments(x_start, y_start, x_ends, y_ends, extent):
+    """
+    Частина відрізків від (x_start, y_start) до (x_ends, y_ends) всередині прямокутника.
+
+    :param x_start, y_start: Спільний початок відрізків.
+    :param x_ends, y_ends: Масиви кінців відрізків.
+    :param extent: (x_min, x_max, y_min, y_max).
+
+    :return: (t, xs, ys) - параметр виходу з прямокутника (0..1) та точка виходу для кожного відрізка;
+        відрізок, що не перетинає прямокутник, отримує t = 0 (точка початку).
+    """
+    x_min, x_max, y_min, y_max = extent
+    dx = np.asarray(x_ends, dtype=float) - x_start
+    dy = np.asarray(y_ends, dtype=float) - y_start
+
+    t_enter = np.zeros(dx.shape)
+    t_exit = np.ones(dx.shape)
+    valid = np.ones(dx.shape, dtype=bool)
+    for p, q in ((-dx, x_start - x_min), (dx, x_max - x_start), (-dy, y_start - y_min), (dy, y_max - y_start)):
+        valid &= ~((p == 0) & (q < 0)) # паралельно межі і зовні
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = q / p
+        t_enter = np.where(p < 0, np.maximum(t_enter, r), t_enter)
+        t_exit = np.where(p > 0, np.minimum(t_exit, r), t_exit)
+    t = np.where(valid & (t_enter <= t_exit), t_exit, 0.0)
+    return t, x_start + t * dx, y_start + t * dy
+
 # Функція для обчислення лінії LOS з урахуванням висот антен
 def calculate_los_with_antenna(smooth_distances, smooth_terrain_heights, tx_height, rx_height):
     los_heights = np.zeros_like(smooth_distances)
@@ -67,19 +168,10 @@ def fresnel_radius(distance, total_distance, wavelength):
 # Функція для обчислення втрат
 def calculate_integrated_losses(smooth_distances, smooth_terrain_heights, smooth_los_heights, 
         total_distance, lambda_wave):
-    losses = []
-    for i in range(len(smooth_distances)):
-        fresnel_r = fresnel_radius(smooth_distances[i], total_distance, lambda_wave)
-        terrain_height = smooth_terrain_heights[i]
-        los_height = smooth_los_heights[i]
-
-        # Якщо висота рельєфу вище лінії прямої видимості (LOS) мінус радіус Френеля
-        if fresnel_r > 0 and terrain_height > (los_height - fresnel_r):
-            loss = (terrain_height - (los_height - fresnel_r)) ** 2 / fresnel_r
-            losses.append(loss)
-        else:
-            losses.append(0)
-    return losses
+    # Якщо висота рельєфу вище лінії прямої видимості (LOS) мінус радіус Френеля,
+    # втрати дорівнюють (h - (los - r))² / r, інакше 0
+    return integrated_losses_array(smooth_distances, smooth_terrain_heights,
+        smooth_los_heights, total_distance, lambda_wave).tolist()
 
 # Функція для обчислення сумарних втрат з використанням підсумовування
 def calculate_total_losses(smooth_distances, smooth_terrain_heights, smooth_los_heights, 
@@ -91,9 +183,82 @@ def calculate_total_losses(smooth_distances, smooth_terrain_heights, smooth_los_
     total_losses_db = 10 * math.log10(total_losses_linear) if total_losses_linear > 1 else 0
     return total_losses_linear, total_losses_db
 
+# Векторизована функція для обчислення втрат у кожній точці профілю
+def integrated_losses_array(smooth_distances, smooth_terrain_heights, smooth_los_heights,
+        total_distance, lambda_wave):
+    """
+    Те саме, що calculate_integrated_losses, але за один прохід numpy без циклу.
+
+    :param smooth_distances: Відстані точок профілю від передавача (м).
+    :param smooth_terrain_heights: Висоти рельєфу в цих точках.
+    :param smooth_los_heights: Висоти LOS (використовуються перші len(smooth_distances) значень).
+    :param total_distance: Повна довжина траси (м).
+    :param lambda_wave: Довжина хвилі (м).
+
+    :return: numpy-масив втрат для кожної точки.
+    """
+    distances = np.asarray(smooth_distances, dtype=float)
+    n = len(distances)
+    terrain = np.asarray(smooth_terrain_heights, dtype=float)[:n]
+    los = np.asarray(smooth_los_heights, dtype=float)[:n]
+
+    fresnel_r = fresnel_radius(distances, total_distance, lambda_wave)
+    clearance = terrain - (los - fresnel_r)
+    obstructed = (fresnel_r > 0) & (clearance > 0)
+
+    losses = np.zeros(n)
+    np.divide(clearance ** 2, fresnel_r, out=losses, where=obstructed)
+    return losses
+
+# Переведення лінійних втрат у дБ (значення ≤ 1 вважаються нульовими втратами)
+def losses_linear_to_db(losses_linear):
+    losses_linear = np.asarray(losses_linear, dtype=float)
+    return np.where(losses_linear > 1, 10 * np.log10(np.maximum(losses_linear, 1)), 0.0)
+
+# Векторизована модель Лонглі-Райса для масиву відстаней
+def longley_rice_array(freq_mhz, distances, q_percent, wa, lambda_wave):
+    """
+    Те саме, що longley_rice_fixed_with_propob_loc, але для масиву відстаней.
+    Поправка propob_loc не залежить від відстані, тому обчислюється один раз.
+    """
+    distances = np.asarray(distances, dtype=float)
+    fspl = 10 * np.log10((4 * np.pi * distances) / lambda_wave)
+    propob_loc, sigma_L, qi_value = get_propob_loc(q_percent, freq_mhz, wa)
+    return fspl + propob_loc
+
+# Рівень сигналу в кожній точці профілю за лінійний час
+def received_power_along_profile(distances, smooth_distances, smooth_terrain_heights, smooth_los_heights,
+        total_distance, lambda_wave, freq_mhz, q_percent, wa, link_budget):
+    """
+    Розрахунок P_rec_real для кожної точки траси, крім першої.
+
+    Втрати дифракції в точці i - це сума втрат на відрізку [0, i], тож замість
+    повторного обчислення зрізів використовується префіксна сума (np.cumsum).
+
+    :param distances: Відстані точок маршруту (для моделі Лонглі-Райса).
+    :param smooth_distances, smooth_terrain_heights, smooth_los_heights: Згладжений профіль.
+    :param total_distance: Повна довжина траси (м).
+    :param lambda_wave: Довжина хвилі (м).
+    :param freq_mhz, q_percent, wa: Параметри моделі Лонглі-Райса.
+    :param link_budget: Сума потужності передавача (дБВт), підсилень та втрат трактів (дБ).
+
+    :return: (losses, P_rec_real_points) - втрати в кожній точці та рівень сигналу
+        для точок 1..n-1 (numpy-масиви).
+    """
+    losses = integrated_losses_array(smooth_distances, smooth_terrain_heights,
+        smooth_los_heights, total_distance, lambda_wave)
+    cumulative_losses_db = losses_linear_to_db(np.cumsum(losses))
+
+    total_loss_lr = longley_rice_array(freq_mhz, np.asarray(distances)[1:], q_percent, wa, lambda_wave)
+    P_rec_real_points = link_budget - (total_loss_lr + cumulative_losses_db[1:])
+    return losses, P_rec_real_points
+
 # Побудова гладкого графіка
 def plot_updated_smooth_terrain(smooth_distances, smooth_terrain_heights, smooth_los_heights,
         graph_distances, graph_terrain_heights, graph_los_heights):
+    # Графіка імпортується лише тут: процеси пулу ("spawn") імпортують maths під час запуску
+    import matplotlib.pyplot as plt
+
     max_height = max(max(graph_terrain_heights), max(graph_los_heights))
     min_height = min(min(graph_terrain_heights), min(graph_los_heights))
 
@@ -177,6 +342,8 @@ def longley_rice_fixed_with_propob_loc(freq_mhz, d_total, q_percent, wa, lambda_
 
 
 if __name__ == "__main__":
+    from scipy.interpolate import make_interp_spline
+
     # Параметри
     freq_mhz = 300  # Частота в МГц
     lambda_wave = 3e8 / (freq_mhz * 1e6)  # Довжина хвилі в метрах
@@ -258,33 +425,11 @@ if __name__ == "__main__":
     coverage_map = P_rec_real >= P_rec
     print(f"P_rec_real: {P_rec_real}, покриття: {coverage_map}")
 
-    # Розрахунок рівня сигналу на кожній точці
-    P_rec_real_points = []
-
-    for i in range(1, num_points):
-        # Відстань до поточної точки
-        d_current = distances[i]
-        
-        # Загальні втрати на поточній точці
-        losses_current = calculate_integrated_losses(
-            smooth_distances[:i+1], smooth_terrain_heights[:i+1], smooth_los_heights[:i+1], 
-            d_total, lambda_wave
-        )
-        total_loss_lr = longley_rice_fixed_with_propob_loc(freq_mhz, d_current, q_percent, wa, lambda_wave)
-        total_loss_linear = sum(losses_current)
-        total_loss_db = 10 * math.log10(total_loss_linear) if total_loss_linear > 1 else 0
-        total_loss_at_i = total_loss_lr + total_loss_db
-        
-        # Розрахунок поточного рівня сигналу
-        P_rec_real_current = (
-            10 * np.log10(P_trm) + G_trm + G_rec 
-            - L_dp - L_f_trm - L_dop_trm
-            - L_f_rec - L_dop_rec 
-            - total_loss_at_i
-        )
-        
-        # Збереження рівня сигналу для поточної точки
-        P_rec_real_points.append(P_rec_real_current)
+    # Розрахунок рівня сигналу на кожній точці (префіксна сума втрат)
+    link_budget = (10 * np.log10(P_trm) + G_trm + G_rec - L_dp - L_f_trm - L_dop_trm -
+              L_f_rec - L_dop_rec)
+    losses, P_rec_real_points = received_power_along_profile(distances, smooth_distances,
+        smooth_terrain_heights, smooth_los_heights, d_total, lambda_wave, freq_mhz, q_percent, wa, link_budget)
 
     # Перевірка покриття на кожній точці
     coverage_map_points = [P >= P_rec for P in P_rec_real_points]
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# Покриття методом радіальної розгортки (viewshed у стилі XDraw).
+# Замість незалежних променів для кожного азимута комірки обробляються кільцями
+# навколо передавача, а стан "горизонту" кожної комірки інтерполюється з двох
+# комірок попереднього кільця, через які проходить лінія на передавач.
+# Кожна комірка в межах радіуса опрацьовується один раз.
+import math
+import numpy as np
+
+import maths # Допоміжний файл з математикою
+import engine # Параметри вкладки, вибірка висот і растрові функції
+
+EARTH_RADIUS = 6371400 # Радіус Землі в метрах (як у maths.haversine_distance)
+
+def _ring(k):
+    """
+    Зсуви (рядок, стовпець) комірок квадратного кільця радіуса k навколо центру.
+    """
+    side = np.arange(-k, k + 1)
+    inner = np.arange(-k + 1, k)
+    rows = np.concatenate([np.full(side.size, -k), np.full(side.size, k), inner, inner])
+    cols = np.concatenate([side, side, np.full(inner.size, -k), np.full(inner.size, k)])
+    return rows, cols
+
+def _parents(rows, cols, k):
+    """
+    Дві комірки кільця k-1, між якими лінія з центру проходить до (rows, cols), та вага другої.
+    """
+    on_side = np.abs(cols) >= np.abs(rows) # лівий/правий бік кільця (включно з кутами)
+
+    along = np.where(on_side, rows, cols) * (k - 1) / k # дробова координата вздовж боку кільця
+    lower = np.clip(np.floor(along), -(k - 1), k - 1)
+    weight = along - lower
+    fixed = np.where(on_side, np.sign(cols), np.sign(rows)) * (k - 1)
+
+    first_rows = np.where(on_side, lower, fixed).astype(np.intp)
+    first_cols = np.where(on_side, fixed, lower).astype(np.intp)
+    second_rows = np.where(on_side, np.minimum(lower + 1, k - 1), fixed).astype(np.intp)
+    second_cols = np.where(on_side, fixed, np.minimum(lower + 1, k - 1)).astype(np.intp)
+    return first_rows, first_cols, second_rows, second_cols, weight
+
+def coverage_viewshed(lon_start, lat_start, height_data, header, settings, max_cells=None, overviews=None,
+        progress=None, cancelled=None):
+    """
+    Растр рівня сигналу навколо передавача за один прохід кільцями.
+
+    Для кожної комірки зберігається найбільший кут підйому рельєфу від передавача
+    (горизонт) та відстань до перешкоди, що його утворює. Це наближення домінантної
+    перешкоди: втрати (h - (los - r))² / r з радіусом Френеля r рахуються лише для
+    найвищої перешкоди на лінії до комірки, тоді як промені (engine.diffraction_losses)
+    підсумовують втрати в усіх точках профілю над LOS. Кривина Землі не враховується
+    (як і в променях). До втрат додається модель Лонглі-Райса.
+
+    Тож за рельєфом растр оптимістичніший за промені: на тестовій мапі з радіусом 30 км
+    медіанна різниця за хребтами становила 25-38 дБ (до 44 дБ), а на відкритій
+    місцевості та в радіусі 10 км - не більше 0.2 дБ.
+
+    :param lon_start, lat_start: Розташування передавача.
+    :param height_data: Мапа рельєфу або мозаїка плиток (dem.Mosaic).
+    :param header: Інформація про заголовок файлу рельєфу (визначає сітку).
+    :param settings: Параметри вкладки {назва: значення}.
+    :param max_cells: Максимальний розмір растра по стороні; комірки мапи об'єднуються за потреби.
+    :param overviews: Піраміда мапи height_data (dem.Pyramid). Якщо комірки об'єднуються, висоти
+        перешкод беруться з рівня "max", тож хребет між центрами комірок не пропускається.
+    :param progress: Функція progress(кільце, всього кілець), що викликається після кожного кільця.
+    :param cancelled: Функція без аргументів для кооперативного скасування (True - зупинити).
+
+    :return: (power, grid) - растр P_rec (NaN поза радіусом, сектором чи даними)
+        та його заголовок у форматі .asc (див. engine.raster_grid), або None, якщо скасовано.
+    """
+    freq_mhz = settings["Частота (GHz)"]            # Частота в ГГц
+    lambda_wave = 3e8 / (freq_mhz * 1e6)            # Довжина хвилі в метрах
+    tx_height = settings["Висота передавача (m)"]   # Висота передавача (у метрах)
+    rx_height = settings["Висота приймача (m)"]     # Висота приймача (у метрах)
+    q_percent = settings["Ймовірність (%)"]         # Відсоток імовірності ціле число від 1 до 99
+    wa = 4000                                       # Роздільна здатність у метрах/Підібрано, щоб sigma_L = 5,5 дБ
+    radius = settings["Радіус (m)"]                 # Радіус кола (у метрах)
+    range_start = settings["Азимут (°)"]            # Початковий азимут сегмента (у градусах)
+    angle = settings["Кут (°)"]                     # Ширина сегмента (у градусах)
+
+    cellsize = header['cellsize']
+    top = header['yllcorner'] + header['nrows'] * cellsize
+
+    # Розмір комірки в метрах та кількість кілець
+    metres_y = math.radians(cellsize) * EARTH_RADIUS
+    metres_x = metres_y * math.cos(math.radians(lat_start))
+    rings = math.ceil(radius / min(metres_x, metres_y))
+    factor = max(1, math.ceil(2 * rings / max_cells)) if max_cells else 1
+    rings = math.ceil(rings / factor)
+    step_x, step_y = metres_x * factor, metres_y * factor
+    size = 2 * rings + 1
+
+    # Центри комірок вікна; центральна комірка містить передавач
+    col0 = math.floor((lon_start - header['xllcorner']) / cellsize)
+    row0 = math.floor((top - lat_start) / cellsize)
+    offsets = np.arange(-rings, rings + 1)
+    lons = header['xllcorner'] + (col0 + 0.5 + offsets * factor) * cellsize
+    lats = top - (row0 + 0.5 + offsets * factor) * cellsize
+    grid_lons, grid_lats = lons[None, :].repeat(size, 0), lats[:, None].repeat(size, 1)
+    heights, _ = engine.sample_heights(grid_lons, grid_lats, height_data, header, "nearest")
+
+    # Висоти перешкод: найвища точка блоку комірок з рівня "max" піраміди
+    obstacle_heights = heights
+    if overviews is not None and factor > 1:
+        _, max_data, max_header = overviews.level_for(factor, "max")
+        obstacle_heights, _ = engine.sample_heights(grid_lons, grid_lats, max_data, max_header, "nearest")
+        obstacle_heights = np.where(np.isnan(heights), np.nan, np.fmax(obstacle_heights, heights))
+
+    grid = {
+        "ncols": size,
+        "nrows": size,
+        "xllcorner": lons[0] - factor * cellsize / 2,
+        "yllcorner": lats[-1] - factor * cellsize / 2,
+        "cellsize": factor * cellsize,
+        "NODATA_value": engine.RASTER_NODATA,
+    }
+    power = np.full((size, size), np.nan, dtype=np.float32)
+
+    # Висота рельєфу під передавачем - з інтерполяцією (INTERPOLATION), як у променях
+    tx_ground, tx_inside = engine.sample_heights([lon_start], [lat_start], height_data, header)
+    if not tx_inside[0]:
+        return power, grid
+    tx_altitude = tx_ground[0] + tx_height
+
+    # Стан горизонту: найбільший нахил (h - h_tx) / d і відстань до відповідної перешкоди
+    horizon = np.full((size, size), -np.inf)
+    obstacle = np.zeros((size, size))
+    budget = engine.link_budget(settings)
+    propob_loc, _, _ = maths.get_propob_loc(q_percent, freq_mhz, wa)
+
+    for k in range(1, rings + 1):
+        rows, cols = _ring(k)
+        d = np.hypot(cols * step_x, rows * step_y)
+        ring_heights = heights[rows + rings, cols + rings]
+        ring_obstacles = obstacle_heights[rows + rings, cols + rings]
+
+        # Горизонт на лінії до передавача, інтерпольований з попереднього кільця
+        if k == 1:
+            parent_horizon = np.full(rows.size, -np.inf)
+            parent_obstacle = np.zeros(rows.size)
+        else:
+            r1, c1, r2, c2, weight = _parents(rows, cols, k)
+            h1, h2 = horizon[r1 + rings, c1 + rings], horizon[r2 + rings, c2 + rings]
+            with np.errstate(invalid='ignore'):
+                parent_horizon = np.where(weight > 0, h1 * (1 - weight) + h2 * weight, h1)
+            parent_obstacle = np.where(weight < 0.5, obstacle[r1 + rings, c1 + rings], obstacle[r2 + rings, c2 + rings])
+
+        # Висота перешкоди над лінією прямої видимості на відстані перешкоди
+        los_slope = (ring_heights + rx_height - tx_altitude) / d
+        with np.errstate(invalid='ignore'):
+            clearance = (parent_horizon - los_slope) * parent_obstacle
+        fresnel_r = maths.fresnel_radius(parent_obstacle, d, lambda_wave)
+        blocked = np.isfinite(parent_horizon) & (fresnel_r > 0) & (clearance + fresnel_r > 0)
+        losses = np.zeros(rows.size)
+        np.divide((clearance + fresnel_r) ** 2, fresnel_r, out=losses, where=blocked)
+
+        received = budget - (10 * np.log10(4 * np.pi * d / lambda_wave) + propob_loc
+            + maths.losses_linear_to_db(losses))
+        inside = (d <= radius) & ~np.isnan(ring_heights)
+        power[rows[inside] + rings, cols[inside] + rings] = received[inside]
+
+        # Оновлення горизонту власним рельєфом комірки (комірки без даних успадковують горизонт)
+        own_slope = np.where(np.isnan(ring_obstacles), -np.inf, (ring_obstacles - tx_altitude) / d)
+        higher = own_slope > parent_horizon
+        horizon[rows + rings, cols + rings] = np.where(higher, own_slope, parent_horizon)
+        obstacle[rows + rings, cols + rings] = np.where(higher, d, parent_obstacle)
+
+        if progress is not None:
+            progress(k, rings)
+        if cancelled is not None and cancelled():
+            return None
+
+    # Обмеження сектором "Азимут (°)" - "Кут (°)"
+    if angle < 360:
+        dx = offsets[None, :] * step_x
+        dy = -offsets[:, None] * step_y
+        azimuths = np.degrees(np.arctan2(dx, dy)) % 360
+        power[(azimuths - range_start) % 360 >= angle] = np.nan
+
+    return power, grid